@@ -0,0 +1,219 @@
+"""Precision and recall of blink detection on labelled footage.
+
+Usage:
+    python -m benchmarks.blink_detection recording.mp4 --labels recording.blinks.json [--config data/configs/99.json]
+    python -m benchmarks.blink_detection --synthetic 300 --fps 30 8 [--check]
+
+A labels file lists when each blink ended (seconds from the start of the
+recording) and, optionally, the gestures the user meant, timed by the end of
+their last blink (a long blink by when the eye closed):
+
+    {"blinks": [3.42, 3.81, 10.05], "gestures": [{"time": 3.81, "type": "double"}]}
+
+A detection matches an unmatched label within --tolerance seconds; unmatched
+detections are phantoms, unmatched labels are misses. Gestures must also
+agree on type. Each trace is scored with BlinkManager and with the previous
+detector (per-frame ratio flag, 0.3 s cooldown, three blinks in 2.5 s is a
+triple), which only knows single and triple.
+
+Synthetic runs include low-EAR users (open-eye EAR 0.20 and 0.24) who blink
+on the very first frame, the case where a fixed starting baseline used to
+leave the eye "closed" for good. --check exits with status 1 if the EAR
+detector's precision or recall on any synthetic trace is below --min-score.
+"""
+import sys
+import json
+import random
+import argparse
+import cv2
+from utils.gaze_base_extended.blink_manager import BlinkManager, SINGLE, DOUBLE, TRIPLE, LONG
+from utils.replay import recording_frames, load_user_config
+
+# EAR below which the synthetic legacy flag fires, about the old width/height ratio of 5
+LEGACY_EAR = 0.2
+
+
+def recorded_trace(path, gaze, fps=None, flip=True):
+    """[(seconds from start, ear, legacy blink flag)] for one recording."""
+    gaze.reset()
+    trace = []
+    for offset, frame in recording_frames(path, fps):
+        if flip:
+            frame = cv2.flip(frame, 1)
+        sample = gaze.refresh(frame, offset)
+        trace.append((offset, sample.ear, sample.blinking))
+    return trace
+
+
+def synthetic_trace(seconds=300.0, fps=30.0, noise=0.02, dropout=0.01, seed=0, baseline=(0.26, 0.34), start=2.0):
+    """EAR trace with known gestures, its open-eye EAR drawn from the `baseline` range. Returns (trace, labels)."""
+    rng = random.Random(seed)
+    baseline = rng.uniform(*baseline)
+    closures = []  # (start, end)
+    gestures = []
+    t = start
+    while t < seconds - 3.0:
+        kind = rng.choice((SINGLE, SINGLE, DOUBLE, TRIPLE, LONG))
+        if kind == LONG:
+            duration = rng.uniform(0.9, 1.5)
+            closures.append((t, t + duration))
+            gestures.append({"time": t, "type": LONG})
+            t += duration
+        else:
+            for i in range({SINGLE: 1, DOUBLE: 2, TRIPLE: 3}[kind]):
+                duration = rng.uniform(0.1, 0.3)
+                closures.append((t, t + duration))
+                t += duration + (rng.uniform(0.15, 0.35) if i < 2 else 0.0)
+            gestures.append({"time": closures[-1][1], "type": kind})
+        # Past the 2.5 s triple window, so separate gestures never add up to an activation
+        t += rng.uniform(2.5, 5.0)
+
+    trace = []
+    index = 0
+    frame = 0
+    while frame / fps < seconds:
+        now = frame / fps
+        while index < len(closures) and closures[index][1] < now:
+            index += 1
+        closed = index < len(closures) and closures[index][0] <= now <= closures[index][1]
+        ear = (0.05 if closed else baseline) + rng.gauss(0, noise)
+        if rng.random() < dropout:
+            ear = None
+        trace.append((now, ear, ear is not None and ear < LEGACY_EAR))
+        frame += 1
+
+    labels = {"blinks": [end for start, end in closures if end - start < 0.7],
+              "gestures": gestures}
+    return trace, labels
+
+
+def detect(trace, params):
+    """(blink end times, [(time, gesture)]) from BlinkManager.
+
+    A gesture is timed by its last blink's end (a long blink by its start),
+    not by when it was reported, so the group_gap wait isn't scored as error.
+    """
+    manager = BlinkManager(**params)
+    blinks, gestures = [], []
+    for timestamp, ear, _ in trace:
+        count = manager.blink_count
+        gesture = manager.update(timestamp, ear)
+        if manager.blink_count > count and manager.last_blink == timestamp:
+            blinks.append(timestamp)
+        if gesture:
+            gestures.append((manager.closed_at if gesture == LONG else manager.last_blink, gesture))
+    return blinks, gestures
+
+
+def detect_legacy(trace, cooldown=0.3, window=2.5):
+    """The per-frame detector this replaced: every flagged frame past the cooldown is a blink."""
+    blinks, gestures = [], []
+    last = 0.0
+    recent = []
+    for timestamp, _, flagged in trace:
+        if not flagged or timestamp - last <= cooldown:
+            continue
+        last = timestamp
+        blinks.append(timestamp)
+        recent = [t for t in recent if timestamp - t <= window] + [timestamp]
+        if len(recent) >= 3:
+            recent = []
+            gestures.append((timestamp, TRIPLE))
+        else:
+            gestures.append((timestamp, SINGLE))
+    return blinks, gestures
+
+
+def match(detected, expected, tolerance):
+    """(true positives, phantoms, misses) pairing detections with the nearest unused label."""
+    used = [False] * len(expected)
+    hits = 0
+    for t, kind in detected:
+        best = None
+        for i, (label_t, label_kind) in enumerate(expected):
+            if used[i] or label_kind != kind or abs(label_t - t) > tolerance:
+                continue
+            if best is None or abs(label_t - t) < abs(expected[best][0] - t):
+                best = i
+        if best is not None:
+            used[best] = True
+            hits += 1
+    return hits, len(detected) - hits, len(expected) - hits
+
+
+def score(detected_blinks, detected_gestures, labels, tolerance):
+    result = {}
+    for name, detected, expected in (
+        ("blinks", [(t, None) for t in detected_blinks], [(t, None) for t in labels.get("blinks", [])]),
+        ("gestures", detected_gestures, [(g["time"], g["type"]) for g in labels.get("gestures", [])]),
+    ):
+        if not expected:
+            continue
+        hits, phantoms, misses = match(detected, expected, tolerance)
+        result[name] = {
+            "precision": hits / (hits + phantoms) if hits + phantoms else 0.0,
+            "recall": hits / (hits + misses) if hits + misses else 0.0,
+            "phantoms": phantoms,
+            "misses": misses,
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="*", help="Recorded video files or frame directories")
+    parser.add_argument("--labels", nargs="*", default=[], help="One labels file per recording")
+    parser.add_argument("--config", default=None, help="User config whose blink thresholds to use")
+    parser.add_argument("--fps", type=float, nargs="*", default=None,
+                        help="Frame rates for synthetic traces (default 30); the first also overrides the recording rate")
+    parser.add_argument("--no-flip", action="store_true", help="Recordings are already mirrored")
+    parser.add_argument("--synthetic", type=float, default=None, help="Seconds of synthetic EAR per frame rate")
+    parser.add_argument("--noise", type=float, default=0.02, help="Synthetic EAR noise")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Seconds between a detection and its label")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--check", action="store_true", help="Fail if a synthetic trace scores below --min-score")
+    parser.add_argument("--min-score", type=float, default=0.9, help="Precision/recall floor for --check")
+    args = parser.parse_args()
+    if len(args.labels) != len(args.paths):
+        parser.error("give one --labels file per recording")
+
+    config = load_user_config(None, args.config) if args.config else {}
+    params = config.get("blink") or {}
+
+    traces = []
+    if args.paths:
+        from utils.gaze_base_extended.pupil_tracker import ExtendedGazeTracker
+        gaze = ExtendedGazeTracker(detection_scale=config.get("detection_scale", 1.0))
+        fps = args.fps[0] if args.fps else None
+        for path, labels_path in zip(args.paths, args.labels):
+            with open(labels_path, "r") as f:
+                traces.append((path, recorded_trace(path, gaze, fps, flip=not args.no_flip), json.load(f)))
+    if args.synthetic:
+        for fps in args.fps or [30.0]:
+            trace, labels = synthetic_trace(args.synthetic, fps, args.noise, seed=args.seed)
+            traces.append((f"synthetic@{fps:g}fps", trace, labels))
+            for ear in (0.20, 0.24):
+                # Landmark jitter scales with the eye's size, and so does EAR noise
+                trace, labels = synthetic_trace(args.synthetic, fps, args.noise * ear / 0.3, seed=args.seed,
+                                                baseline=(ear, ear), start=0.0)
+                traces.append((f"ear{ear:.2f}@{fps:g}fps", trace, labels))
+    if not traces:
+        parser.error("give recordings with --labels and/or --synthetic SECONDS")
+
+    print(f"{'trace':>20} {'detector':>9} {'kind':>9} {'precision':>10} {'recall':>7} {'phantom':>8} {'missed':>7}")
+    failed = []
+    for name, trace, labels in traces:
+        for detector, (blinks, gestures) in (("ear", detect(trace, params)), ("legacy", detect_legacy(trace))):
+            for kind, r in score(blinks, gestures, labels, args.tolerance).items():
+                print(f"{name:>20} {detector:>9} {kind:>9} {r['precision']:>10.1%} {r['recall']:>7.1%} "
+                      f"{r['phantoms']:>8d} {r['misses']:>7d}")
+                if detector == "ear" and name not in args.paths and min(r["precision"], r["recall"]) < args.min_score:
+                    failed.append(f"{name} {kind}")
+
+    if args.check and failed:
+        print(f"[ERROR] Below {args.min_score:.0%}: {', '.join(failed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
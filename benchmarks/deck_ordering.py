@@ -0,0 +1,107 @@
+"""Expected blinks per selection under static, predictive and adaptive deck ordering.
+
+Usage:
+    python -m benchmarks.deck_ordering --user 99 [--root data/user_data] [--deck-file deck.yaml]
+    python -m benchmarks.deck_ordering --synthetic 200
+
+Selections from the user's saved sessions are replayed in order. Before
+each selection the card's level is ranked using only the selections that
+came before it, the same way DeckManager ranks a level as it is entered,
+and the card's position in that order is the number of blinks it would
+have taken. The model then observes the selection.
+"""
+import random
+import argparse
+import numpy as np
+from utils.deck_manager import DeckManager, deck
+from utils.deck_loader import compile_deck, load_deck_file
+from utils.session_store import SessionStore
+from utils.usage_model import UsageModel, session_selections
+
+MODES = ("static", "predict", "reorder")
+
+
+def user_sessions(root, user_id):
+    store = SessionStore(root)
+    return [session_selections(store.get_session(user_id, session_id) or {})
+            for session_id, _ in store.list_sessions(user_id)]
+
+
+def synthetic_sessions(compiled, sessions=200, selections=15, seed=0):
+    """Sessions with a skewed favourite-card distribution and a few habitual follow-ups."""
+    rng = random.Random(seed)
+    leaves = [node for node in range(1, len(compiled.cards)) if not compiled.child_count[node]]
+    weights = [1.0 / (rank + 1) for rank in range(len(leaves))]
+    rng.shuffle(weights)
+    habits = {node: rng.choice(leaves) for node in rng.sample(leaves, len(leaves) // 3)}
+
+    result = []
+    now = 0.0
+    for _ in range(sessions):
+        picks = []
+        previous = None
+        for _ in range(selections):
+            if previous in habits and rng.random() < 0.6:
+                leaf = habits[previous]
+            else:
+                leaf = rng.choices(leaves, weights)[0]
+            # A leaf is reached by selecting each menu on its path first, as in the session log
+            path, node = [], leaf
+            while node:
+                path.append(node)
+                node = compiled.parent[node]
+            for node in reversed(path):
+                now += 20.0
+                picks.append((compiled.cards[node]["label"], now))
+            previous = leaf
+        result.append(picks)
+        now += 86400.0
+    return result
+
+
+def evaluate(compiled, sessions, mode, half_life_days=14.0):
+    usage = None if mode == "static" else UsageModel(half_life_days=half_life_days)
+    manager = DeckManager(compiled, usage=usage, order_mode=mode)
+    blinks = []
+    for picks in sessions:
+        if usage is not None:
+            usage.reset_context()
+        for label, when in picks:
+            node = compiled.find(label)
+            if node is None:
+                continue
+            blinks.append(manager.level_order(compiled.parent[node]).index(node))
+            if usage is not None:
+                usage.observe(label, when)
+    return np.array(blinks, dtype=float)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--user", default=None, help="User whose saved sessions to replay")
+    parser.add_argument("--root", default="data/user_data")
+    parser.add_argument("--deck-file", default=None, help="Deck the sessions used (defaults to the built-in deck)")
+    parser.add_argument("--half-life", type=float, default=14.0, help="Recency half-life in days")
+    parser.add_argument("--synthetic", type=int, default=None, help="Number of synthetic sessions instead of --user")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    compiled = compile_deck(load_deck_file(args.deck_file) if args.deck_file else deck)
+    if args.synthetic:
+        sessions = synthetic_sessions(compiled, args.synthetic, seed=args.seed)
+    elif args.user:
+        sessions = user_sessions(args.root, args.user)
+    else:
+        parser.error("give --user or --synthetic N")
+
+    print(f"{'mode':>8} {'selections':>11} {'mean_blinks':>12} {'p90_blinks':>11}")
+    for mode in MODES:
+        blinks = evaluate(compiled, sessions, mode, args.half_life)
+        if not len(blinks):
+            print(f"{mode:>8} {0:>11d} {'n/a':>12} {'n/a':>11}")
+            continue
+        print(f"{mode:>8} {len(blinks):>11d} {blinks.mean():>12.2f} {np.percentile(blinks, 90):>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Compare gaze-ratio accuracy and per-frame latency across face detection scales.
+
+Usage:
+    python -m benchmarks.detection_scale recording.mp4 [more.mp4 ...] --scales 1.0 0.75 0.5 0.35
+
+Every frame is refreshed through a full-resolution reference tracker and one
+tracker per scale. ROI tracking is disabled by default so each frame measures
+a full detection; pass --roi-tracking to benchmark the combined setup.
+"""
+import argparse
+import time
+import cv2
+import numpy as np
+from utils.gaze_base_extended.pupil_tracker import ExtendedGazeTracker
+
+
+def read_frames(path, max_frames=None):
+    video = cv2.VideoCapture(path)
+    count = 0
+    while max_frames is None or count < max_frames:
+        ret, frame = video.read()
+        if not ret:
+            break
+        count += 1
+        yield cv2.flip(frame, 1)
+    video.release()
+
+
+def run(paths, scales, roi_tracking=False, max_frames=None):
+    reference = ExtendedGazeTracker(roi_tracking=False)
+    trackers = {s: ExtendedGazeTracker(roi_tracking=roi_tracking, detection_scale=s) for s in scales}
+    ratios = {s: [] for s in scales}
+    latency = {s: [] for s in scales}
+    ref_ratios = []
+
+    for path in paths:
+        for frame in read_frames(path, max_frames):
+            reference.refresh(frame)
+            ref_ratios.append(_ratios(reference))
+            for scale, tracker in trackers.items():
+                start = time.perf_counter()
+                tracker.refresh(frame)
+                latency[scale].append(time.perf_counter() - start)
+                ratios[scale].append(_ratios(tracker))
+
+    ref = np.array(ref_ratios, dtype=float)
+    results = []
+    for scale in scales:
+        est = np.array(ratios[scale], dtype=float)
+        both = ~np.isnan(ref).any(axis=1) & ~np.isnan(est).any(axis=1)
+        ref_located = ~np.isnan(ref).any(axis=1)
+        err = np.abs(est[both] - ref[both])
+        lat_ms = np.array(latency[scale]) * 1000
+        results.append({
+            "scale": scale,
+            "frames": len(est),
+            "located_rate": float(both.sum() / ref_located.sum()) if ref_located.any() else 0.0,
+            "mae_horizontal": float(err[:, 0].mean()) if len(err) else None,
+            "mae_vertical": float(err[:, 1].mean()) if len(err) else None,
+            "max_err": float(err.max()) if len(err) else None,
+            "latency_mean_ms": float(lat_ms.mean()) if len(lat_ms) else None,
+            "latency_p95_ms": float(np.percentile(lat_ms, 95)) if len(lat_ms) else None,
+        })
+    return results
+
+
+def _ratios(tracker):
+    if not tracker.pupils_located:
+        return (np.nan, np.nan)
+    return (tracker.horizontal_ratio(), tracker.vertical_ratio())
+
+
+def _fmt(value, spec):
+    return "n/a" if value is None else format(value, spec)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="Recorded video files")
+    parser.add_argument("--scales", nargs="+", type=float, default=[1.0, 0.75, 0.5, 0.35])
+    parser.add_argument("--roi-tracking", action="store_true")
+    parser.add_argument("--max-frames", type=int, default=None, help="Per-file frame limit")
+    args = parser.parse_args()
+
+    results = run(args.paths, args.scales, roi_tracking=args.roi_tracking, max_frames=args.max_frames)
+    print(f"{'scale':>6} {'frames':>7} {'located':>8} {'mae_h':>7} {'mae_v':>7} {'max_err':>8} {'mean_ms':>8} {'p95_ms':>7}")
+    for r in results:
+        print(f"{r['scale']:>6.2f} {r['frames']:>7d} {r['located_rate']:>8.1%} "
+              f"{_fmt(r['mae_horizontal'], '.4f'):>7} {_fmt(r['mae_vertical'], '.4f'):>7} "
+              f"{_fmt(r['max_err'], '.4f'):>8} {_fmt(r['latency_mean_ms'], '.1f'):>8} "
+              f"{_fmt(r['latency_p95_ms'], '.1f'):>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""Compare gaze smoothing filters by time-to-select and false-trigger rate.
+
+Usage:
+    python -m benchmarks.gaze_filters recording.mp4 [more ...] [--config data/configs/99.json]
+    python -m benchmarks.gaze_filters --synthetic 120 --noise 0.03
+
+Each recording is run through the tracker once; the resulting gaze samples
+are then replayed through a fresh GazeSelector (deck active, replay clock)
+once per filter, so every filter sees identical input.
+
+The intended target of a frame is the sector the raw gaze occupied for the
+majority of the preceding trigger_time window (synthetic traces carry their
+true targets instead). A trigger on any other target counts as false;
+time-to-select is measured from the start of the intended fixation.
+"""
+import time
+import random
+import argparse
+import cv2
+import numpy as np
+from utils.gaze_base_extended.pupil_tracker import ExtendedGazeTracker, GazeSample
+from utils.gaze_base_extended.gaze_selector import GazeSelector
+from utils.gaze_base_extended.gaze_filter import FILTERS, build_filter
+from utils.gaze_base_extended.gaze_mapping import GazeMapping
+from utils.gaze_base_extended.radial_layout import screen_layout
+from utils.deck_manager import DeckManager, deck
+from utils.replay import ReplayClock, recording_frames, load_user_config
+
+BASELINE_FILTERS = [
+    ("none", None),
+    ("one_euro", {"type": "one_euro"}),
+    ("kalman", {"type": "kalman"}),
+    ("median", {"type": "median"}),
+]
+
+
+def recorded_trace(path, gaze, fps=None, max_frames=None, flip=True):
+    """Gaze samples for one recording, timestamped in seconds from its start."""
+    gaze.reset()
+    samples = []
+    for offset, frame in recording_frames(path, fps):
+        if max_frames is not None and len(samples) >= max_frames:
+            break
+        if flip:
+            frame = cv2.flip(frame, 1)
+        samples.append(gaze.refresh(frame, offset))
+    return samples
+
+
+def synthetic_trace(layout, seconds=120.0, fps=30.0, noise=0.03, spike_rate=0.02, seed=0):
+    """Noisy fixations alternating between the center and each target's sector.
+
+    Returns (samples, intended target per frame).
+    """
+    rng = random.Random(seed)
+    cx, cy = layout.center
+    targets = [None] + list(layout.keys)
+    samples, intended = [], []
+    t = 0.0
+    while t < seconds:
+        key = rng.choice(targets)
+        if key is None:
+            fx, fy = cx, cy
+        else:
+            spec = layout.spec[layout.keys.index(key)]
+            start, end = spec["theta"]
+            mid = np.radians((start + (end - start) % 360 / 2) % 360)
+            inner, outer = layout._ring(spec)
+            radius = 0.2 if inner <= 0.2 <= outer else (inner + outer) / 2
+            fx, fy = cx + radius * np.cos(mid), cy + radius * np.sin(mid)
+
+        end_t = t + rng.uniform(1.0, 3.0)
+        while t < end_t:
+            x = fx + rng.gauss(0, noise)
+            y = fy + rng.gauss(0, noise)
+            if rng.random() < spike_rate:
+                x += rng.gauss(0, noise * 5)
+                y += rng.gauss(0, noise * 5)
+            samples.append(GazeSample(t, x, y, True, False))
+            intended.append(key)
+            t += 1.0 / fps
+    return samples, intended
+
+
+def raw_intended(samples, layout, window):
+    """Majority raw-gaze target over the trailing window, per frame."""
+    intended = []
+    history = []
+    counts = {}
+    for sample in samples:
+        key = layout.lookup(sample.x, sample.y) if sample.located and sample.x is not None else None
+        history.append((sample.timestamp, key))
+        counts[key] = counts.get(key, 0) + 1
+        while history and sample.timestamp - history[0][0] > window:
+            counts[history.pop(0)[1]] -= 1
+        best = max(counts, key=counts.get)
+        intended.append(best if counts[best] * 2 > len(history) else None)
+    return intended
+
+
+def evaluate(samples, intended, spec, trigger_time=1.25, layout=None, inner_radius=0.0):
+    clock = ReplayClock(samples[0].timestamp if samples else 0.0)
+    selector = GazeSelector(trigger_time=trigger_time, center=(0.5, 0.5), inner_radius=inner_radius,
+                            outer_radius=0.75, clock=clock, layout=layout)
+    deck_manager = DeckManager(deck, selector=selector)
+    deck_manager.activate()
+    gaze_filter = build_filter(spec)
+
+    segment_start = 0
+    selected_segment = None
+    triggers = false_triggers = 0
+    times = []
+    filter_seconds = 0.0
+    for i, sample in enumerate(samples):
+        if i and intended[i] != intended[i - 1]:
+            segment_start = i
+        clock.now = sample.timestamp
+        if gaze_filter is not None:
+            started = time.perf_counter()
+            sample = gaze_filter.apply(sample)
+            filter_seconds += time.perf_counter() - started
+
+        selector.dwell_enabled = not sample.is_blinking()
+        event = selector.update(sample, deck_manager=deck_manager)
+        if not event:
+            continue
+        triggers += 1
+        if event["action"] != intended[i]:
+            false_triggers += 1
+        elif selected_segment != segment_start:
+            # Only the first selection of a fixation measures time-to-select
+            selected_segment = segment_start
+            times.append(sample.timestamp - samples[segment_start].timestamp)
+
+    return {
+        "frames": len(samples),
+        "triggers": triggers,
+        "false_triggers": false_triggers,
+        "false_rate": false_triggers / triggers if triggers else 0.0,
+        "selections": len(times),
+        "tts_mean": float(np.mean(times)) if times else None,
+        "filter_us": filter_seconds / len(samples) * 1e6 if samples else 0.0,
+    }
+
+
+def run(traces, filters, trigger_time=1.25, layout=None, inner_radius=0.0):
+    """traces: [(samples, intended)]. Returns one merged result per filter."""
+    results = []
+    for name, spec in filters:
+        merged = {"filter": name, "frames": 0, "triggers": 0, "false_triggers": 0}
+        tts, filter_us = [], []
+        for samples, intended in traces:
+            r = evaluate(samples, intended, spec, trigger_time, layout, inner_radius)
+            for key in ("frames", "triggers", "false_triggers"):
+                merged[key] += r[key]
+            if r["tts_mean"] is not None:
+                tts.append((r["tts_mean"], r["selections"]))
+            filter_us.append(r["filter_us"])
+        correct = sum(n for _, n in tts)
+        merged["false_rate"] = merged["false_triggers"] / merged["triggers"] if merged["triggers"] else 0.0
+        merged["tts_mean"] = sum(m * n for m, n in tts) / correct if correct else None
+        merged["filter_us"] = float(np.mean(filter_us)) if filter_us else 0.0
+        results.append(merged)
+    return results
+
+
+def _fmt(value, spec):
+    return "n/a" if value is None else format(value, spec)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="*", help="Recorded video files or frame directories")
+    parser.add_argument("--config", default=None, help="User config whose gaze_filter/radial_layout to include")
+    parser.add_argument("--trigger-time", type=float, default=1.25)
+    parser.add_argument("--inner-radius", type=float, default=0.0, help="Selector dead zone around the center")
+    parser.add_argument("--fps", type=float, default=None)
+    parser.add_argument("--max-frames", type=int, default=None, help="Per-recording frame limit")
+    parser.add_argument("--no-flip", action="store_true", help="Recordings are already mirrored")
+    parser.add_argument("--synthetic", type=float, default=None, help="Seconds of synthetic gaze to add")
+    parser.add_argument("--noise", type=float, default=0.03, help="Synthetic gaze noise (ratio units)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = load_user_config(None, args.config) if args.config else {}
+    # Filters see screen positions when the user has a calibrated mapping, as in a live session
+    mapping = GazeMapping.from_config(config.get("gaze_mapping"))
+    # ...and then select on the on-screen button boxes, as build_controller does
+    layout_spec = config.get("radial_layout")
+    if layout_spec is None and mapping is not None:
+        layout_spec = screen_layout()
+    selector = GazeSelector(center=(0.5, 0.5), inner_radius=args.inner_radius, outer_radius=0.75,
+                            layout=layout_spec)
+    layout = selector.layout
+
+    traces = []
+    if args.paths:
+        gaze = ExtendedGazeTracker(detection_scale=config.get("detection_scale", 1.0))
+        for path in args.paths:
+            samples = recorded_trace(path, gaze, args.fps, args.max_frames, flip=not args.no_flip)
+            if mapping is not None:
+                samples = [mapping.apply_sample(sample) for sample in samples]
+            if samples:
+                traces.append((samples, raw_intended(samples, layout, args.trigger_time)))
+    if args.synthetic:
+        traces.append(synthetic_trace(layout, args.synthetic, noise=args.noise, seed=args.seed))
+    if not traces:
+        parser.error("give recordings and/or --synthetic SECONDS")
+
+    filters = list(BASELINE_FILTERS)
+    if config.get("gaze_filter") and config["gaze_filter"].get("type") in FILTERS:
+        filters.append(("user", config["gaze_filter"]))
+
+    results = run(traces, filters, args.trigger_time, layout_spec, args.inner_radius)
+    print(f"{'filter':>9} {'frames':>7} {'triggers':>9} {'false':>6} {'false%':>7} {'tts_s':>6} {'us/frame':>9}")
+    for r in results:
+        print(f"{r['filter']:>9} {r['frames']:>7d} {r['triggers']:>9d} {r['false_triggers']:>6d} "
+              f"{r['false_rate']:>7.1%} {_fmt(r['tts_mean'], '.2f'):>6} {r['filter_us']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
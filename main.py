@@ -1,15 +1,41 @@
-import cv2
 import time
 import uuid
-from ui import overlay
-from utils.gaze_base_extended.pupil_tracker import ExtendedGazeTracker
-from utils.gaze_base_extended.gaze_selector import GazeSelector
-from utils.gaze_base_extended.blink_manager import BlinkManager
-from utils.deck_manager import DeckManager, deck
-from utils.session_builder import UserBuilder
+import argparse
+from utils.instrumentation import StartupProfiler
+from utils.resources import SharedResources
+
+startup = StartupProfiler()
+
+parser = argparse.ArgumentParser(description="Gaze-controlled communication deck")
+parser.add_argument("--show-timings", action="store_true", help="Overlay rolling stage timings (toggle with 't')")
+parser.add_argument("--headless", action="store_true", help="No preview window; selection, blinks, deck and logging only (Ctrl+C to stop)")
+parser.add_argument("--low-power", action="store_true", help="Lower the capture rate while the deck is inactive")
+parser.add_argument("--idle-fps", type=float, default=8.0, help="Capture rate in low-power mode while idle")
+parser.add_argument("--calibrate", action="store_true", help="Redo the nine-point gaze calibration even if a mapping is saved")
+parser.add_argument("--profile-startup", action="store_true", help="Print a time-to-first-frame breakdown by startup phase")
+parser.add_argument("--trace", action="store_true", help="Record every frame's gaze, blink and dwell state to data/traces/<id>/<session_id>")
+parser.add_argument("--events-port", type=int, default=None, help="Stream live session events on this localhost TCP port")
+parser.add_argument("--events-socket", default=None, help="Stream live session events on this Unix socket instead")
+args = parser.parse_args()
+
+# Import cv2/dlib, load the landmark model and open the camera while the user types their ID
+resources = SharedResources(camera_index=0, startup=startup)
+resources.preload()
 
 # User session configuration
-user_id = input("Enter your user ID: ").strip()
+with startup.phase("user_prompt"):
+    user_id = input("Enter your user ID: ").strip()
+
+# Deferred until after the prompt so it appears immediately; the preload
+# thread has usually imported cv2 and numpy by now
+with startup.phase("imports"):
+    import cv2
+    from ui import overlay
+    from utils.session_builder import UserBuilder
+    from utils.session_controller import build_controller, controller_options
+    from utils.pipeline import GazePipeline, FrameRateGovernor
+    from utils.instrumentation import FrameProfiler
+
 user = UserBuilder(user_id)
 user.create_user(metadata={"created_at": time.strftime("%Y-%m-%d %H:%M:%S")})
 
@@ -17,120 +43,130 @@ if not user.validate_user():
     print("[ERROR] User ID not recognized.")
     exit()
 
-user_config = user.calibrate()
+# Calibration and the main loop share one warmed-up tracker and camera
+with startup.phase("wait_preload"):
+    gaze = resources.tracker()
+    webcam = resources.camera()
+with startup.phase("calibration"):
+    user_config = user.calibrate(gaze=gaze, webcam=webcam, multi_point=not args.headless,
+                                recalibrate=args.calibrate)
 session_id = time.strftime("%Y%m%d_%H%M%S")
 user.init_session_stats(session_id)
 
 # Intialize modules
-gaze = ExtendedGazeTracker()
-selector = GazeSelector(trigger_time=1.25, center=(0.5, 0.5), inner_radius=0.00, outer_radius=0.25)
-blink_manager = BlinkManager()
-deck_manager = DeckManager(deck, selector=selector)
-webcam = cv2.VideoCapture(0)
-emergency_mode = False
+gaze.detection_scale = user_config.get("detection_scale", 1.0)
+profiler = FrameProfiler()
+with startup.phase("build_controller"):
+    events = None
+    if args.events_port or args.events_socket:
+        from utils.event_stream import EventStream
+        events = EventStream(port=args.events_port or 0, unix_path=args.events_socket).start()
+    trace_dir = f"data/traces/{user_id}/{session_id}" if args.trace else None
+    controller = build_controller(user, profiler=profiler, events=events, trace_dir=trace_dir,
+                                  **controller_options(user_config))
+selector = controller.selector
+deck_manager = controller.deck_manager
+
+governor = None
+if args.low_power:
+    # Keep the driver from queueing stale frames while capture is throttled
+    webcam.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    governor = FrameRateGovernor(idle_fps=args.idle_fps)
+
+# Capture and gaze inference run on background threads; this loop renders
+# the newest analysed frame so dwell never runs on stale samples.
+pipeline = GazePipeline(webcam, gaze, profiler=profiler, keep_frames=not args.headless, governor=governor)
+show_timings = args.show_timings
+pipeline.start()
+startup.mark("pipeline_started")
 
 # Main Loop
-while True:
-    ret, frame = webcam.read()
-    if not ret:
-        print("Failed to capture frame.")
-        break
-
-    frame = cv2.flip(frame, 1)
-    gaze.refresh(frame)
-    selector.dwell_enabled = not gaze.is_blinking()
-    user.session_summary["total_frames"] += 1
-
-    # Process gaze selection
-    frame, event = selector.process(
-        frame,
-        gaze,
-        deck_manager=deck_manager if deck_manager.is_active() else None,
-        emergency_mode=emergency_mode
-    )
-
-    # Dwell progress arc
-    if selector.current_selection and selector.dwell_progress > 0.0:
-        height, width = frame.shape[:2]
-        box_w, box_h = width // 4, height // 4
-        x_frac, y_frac = selector.button_actions[selector.current_selection]["corner"]
-        x = int(x_frac * (width - box_w))
-        y = int(y_frac * (height - box_h))
-        center = (x + box_w // 2, y + box_h // 2)
-        dwell_ratio = selector.dwell_progress / selector.trigger_time
-        overlay.draw_dwell_arc(frame, center, 30, dwell_ratio)
-
-    # Handle Dwell triggered events
-    if event:
-        # Augment base event with raw gaze metrics
-        event["horizontal_ratio"] = gaze.horizontal_ratio()
-        event["vertical_ratio"] = gaze.vertical_ratio()
-        event["dwell_time"] = selector.dwell_progress
-
-        if emergency_mode:
-            if event["action"] == "upper_left":
-                emergency_mode = False
-                user.session_summary["emergency_mode_exits"] += 1
-                deck_manager.deactivate()
-        else:
-            if event["action"] == "upper_left":
-                if deck_manager.is_active():
-                    deck_manager.deactivate()
-                    user.session_summary["deck_deactivations"] += 1
-                else:
-                    deck_manager.activate()
-                    user.session_summary["deck_activations"] += 1
-
-            elif event["action"] == "upper_right" and deck_manager.is_active():
-                selected_card = deck_manager.select()
-                user.session_summary["card_flips"] += 1
-
-                # Add type and label for card-specific events
-                event["type"] = "card_selected"
-                event["label"] = selected_card["label"]
-
-                if selected_card["label"].strip().lower() == "emergency":
-                    emergency_mode = True
-                    user.session_summary["emergency_mode_entries"] += 1
-
-        # Log final composed event
-        user.log_event_detail(event)
-
-    # Blink Navigation
-    if gaze.is_blinking():
-        now = time.time()
-        blink_type = blink_manager.register_blink(now)
-        user.session_summary["total_blinks"] += 1
-
-        if blink_type == "triple":
-            deck_manager.activate()
-            user.session_summary["deck_activations"] += 1
-        elif deck_manager.is_active() and blink_type == "single":
-            deck_manager.on_blink(now)
-            user.session_summary["card_flips"] += 1
-
-    # Deck UI
-    frame = deck_manager.draw(frame)
-
-    # Emergency Overlay... should probably be UI overlay
-    if emergency_mode:
-        text = "EMERGENCY"
-        font = cv2.FONT_HERSHEY_DUPLEX
-        font_scale = 3.0
-        thickness = 5
-        color = (0, 0, 255)
-
-        text_size, _ = cv2.getTextSize(text, font, font_scale, thickness)
-        text_width, text_height = text_size
-        text_x = (frame.shape[1] - text_width) // 2
-        text_y = (frame.shape[0] + text_height) // 2
-        cv2.putText(frame, text, (text_x, text_y), font, font_scale, color, thickness, cv2.LINE_AA)
-
-    cv2.imshow("Gaze Selector", frame)
-    if cv2.waitKey(1) == 27:
-        break
+failure = None
+try:
+    while pipeline.running():
+        item = pipeline.next_sample()
+        if item is None:
+            continue
+        frame, sample = item
+        startup.mark("first_sample")
+
+        # Selection, dwell events and blink navigation
+        controller.step(sample)
+
+        if governor:
+            governor.set_active(deck_manager.is_active())
+            # A closing eye may be the start of the activation triple blink
+            if controller.blink_manager.closed or controller.last_gesture:
+                governor.notify_activity()
+
+        if args.headless:
+            profiler.record("end_to_end", time.time() - sample.timestamp)
+            pipeline.report_if_due()
+            if args.profile_startup and "first_frame" not in startup.marks:
+                startup.mark("first_frame")
+                print(startup.report())
+            continue
+
+        draw_start = time.perf_counter()
+        frame = overlay.draw_selector_overlay(frame, selector)
+
+        # Dwell progress arc
+        if selector.current_selection and selector.dwell_progress > 0.0:
+            height, width = frame.shape[:2]
+            box_w, box_h = width // 4, height // 4
+            x_frac, y_frac = selector.button_actions[selector.current_selection]["corner"]
+            x = int(x_frac * (width - box_w))
+            y = int(y_frac * (height - box_h))
+            center = (x + box_w // 2, y + box_h // 2)
+            dwell_ratio = selector.dwell_progress / selector.trigger_time
+            overlay.draw_dwell_arc(frame, center, 30, dwell_ratio)
+
+        # Deck UI
+        frame = deck_manager.draw(frame)
+
+        # Emergency Overlay
+        if controller.emergency_mode:
+            overlay.draw_emergency_banner(frame)
+        overlay.draw_action_ack(frame, controller.dispatcher.last_ticket)
+
+        overlay.draw_pipeline_stats(frame, pipeline)
+        if show_timings:
+            overlay.draw_stage_timings(frame, profiler)
+            overlay.draw_timestamp_and_latency(frame, (profiler.histograms["end_to_end"].last_ms or 0.0) / 1000)
+        profiler.record("draw", time.perf_counter() - draw_start)
+        pipeline.report_if_due()
+
+        with profiler.stage("imshow"):
+            cv2.imshow("Gaze Selector", frame)
+            key = cv2.waitKey(1)
+        # Gaze-to-feedback latency: frame capture until its overlay is on screen
+        profiler.record("end_to_end", time.time() - sample.timestamp)
+        if args.profile_startup and "first_frame" not in startup.marks:
+            startup.mark("first_frame")
+            print(startup.report())
+        if key == 27:
+            break
+        if key == ord("t"):
+            show_timings = not show_timings
+except KeyboardInterrupt:
+    print("[INFO] Stopping session...")
+except Exception as e:
+    # Save what was recorded before surfacing the error
+    failure = e
+    print(f"[ERROR] Session loop failed: {type(e).__name__}: {e}")
 
 # Cleanup
+pipeline.stop()
+pipeline.join()
+print(f"[PERF] {pipeline.summary()}")
+controller.close()
 user.save_session_data(config=user_config)
-webcam.release()
-cv2.destroyAllWindows()
+if events:
+    events.close()
+metrics_path = profiler.export(f"data/metrics/{user_id}/{session_id}.json", extra={"pipeline": pipeline.summary()})
+print(f"[INFO] Frame timings saved to {metrics_path}")
+resources.release()
+if not args.headless:
+    cv2.destroyAllWindows()
+if failure is not None:
+    raise failure
@@ -1,6 +1,7 @@
 import cv2
 import math
 import time
+from ui.compositor import compositor
 
 def draw_buttons(frame, actions, selected_key, box_size):
     """Draws all button regions and their labels."""
@@ -51,25 +52,46 @@ def draw_timestamp_and_latency(frame, latency):
                 cv2.FONT_HERSHEY_SIMPLEX, 0.5, (100, 255, 100), 1)
 
 def draw_selector_overlay(frame, selector):
-    height, width = frame.shape[:2]
-    box_w, box_h = width // 4, height // 4
+    """Draws translucent buttons, borders and labels, blending only each button's ROI."""
+    return compositor.draw_buttons(frame, selector)
 
-    for key, data in selector.button_actions.items():
-        x_frac, y_frac = data["corner"]
-        x = int(x_frac * (width - box_w))
-        y = int(y_frac * (height - box_h))
-        color = (0, 255, 0) if selector.current_selection == key else (180, 180, 180)
+def draw_emergency_banner(frame):
+    """Draws the centered EMERGENCY banner."""
+    return compositor.draw_centered_text(frame, "EMERGENCY", cv2.FONT_HERSHEY_DUPLEX, 3.0, (0, 0, 255), 5)
 
-        # Create translucent overlay
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (x, y), (x + box_w, y + box_h), (180, 180, 180), -1)
-        cv2.addWeighted(overlay, 0.6, frame, 0.4, 0, frame)
+ACK_TEXT = {"queued": "Sent", "running": "Sent", "ok": "Done", "error": "Failed",
+            "timeout": "Timed out", "rejected": "Busy, not sent"}
+ACK_COLORS = {"ok": (100, 255, 100), "error": (0, 0, 255), "timeout": (0, 0, 255), "rejected": (0, 165, 255)}
 
-        # Draw border and label
-        border_color = (0, 255, 0) if selector.current_selection == key else (100, 100, 100)
-        cv2.rectangle(frame, (x, y), (x + box_w, y + box_h), border_color, 2)
-        cv2.putText(frame, data["label"], (x + 10, y + 40),
-                    cv2.FONT_HERSHEY_DUPLEX, 1, border_color, 2)
+def draw_action_ack(frame, ticket, hold=2.0):
+    """Acknowledges the last card action the moment it is queued, then shows its outcome for `hold` seconds."""
+    if ticket is None:
+        return frame
+    if ticket.finished_at is not None and time.monotonic() - ticket.finished_at > hold:
+        return frame
+    text = f"{ACK_TEXT.get(ticket.status, ticket.status)}: {ticket.label}"
+    return compositor.draw_centered_text(frame, text, cv2.FONT_HERSHEY_SIMPLEX, 0.8,
+                                         ACK_COLORS.get(ticket.status, (255, 255, 255)), 2, y=frame.shape[0] - 120)
 
-    return frame
+def draw_pipeline_stats(frame, pipeline):
+    """Draws per-stage FPS and queue depth for the threaded pipeline."""
+    parts = [f"{name} {stats.fps():.0f}" for name, stats in pipeline.stats.items()]
+    text = "FPS " + " | ".join(parts) + f" | queue {pipeline.frames.depth()}/{pipeline.frames.maxsize}"
+    cv2.putText(frame, text, (20, frame.shape[0] - 85),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (100, 255, 100), 1)
+
+def draw_stage_timings(frame, profiler):
+    """Draws rolling p50/p95/p99 stage timings (ms) from a FrameProfiler."""
+    y = frame.shape[0] // 3
+    for stage, pct in profiler.rolling().items():
+        text = f"{stage:<10} p50 {pct['p50']:6.1f}  p95 {pct['p95']:6.1f}  p99 {pct['p99']:6.1f} ms"
+        cv2.putText(frame, text, (20, y), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (100, 255, 100), 1)
+        y += 18
 
+def draw_calibration_target(frame, point, progress):
+    """Draws a calibration dot at a screen fraction, with a ring filling as samples are collected."""
+    height, width = frame.shape[:2]
+    center = (int(point[0] * width), int(point[1] * height))
+    cv2.circle(frame, center, 10, (0, 0, 255), -1)
+    if progress > 0:
+        cv2.ellipse(frame, center, (22, 22), -90, 0, int(progress * 360), (0, 255, 255), 3)
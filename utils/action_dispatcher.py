@@ -0,0 +1,192 @@
+"""Runs deck card actions off the frame loop.
+
+Card actions (speech, alerts, caregiver notifications) can be slow; running
+them inline would freeze gaze tracking and dwell timing. submit() only
+queues the action and returns a ticket, so the UI can acknowledge the
+selection on the same frame.
+
+- Two lanes on one priority queue: emergency actions always run before any
+  queued normal action, and one worker only ever takes emergency actions,
+  so an emergency never waits behind a slow normal action.
+- The normal lane is bounded; when it is full, new normal actions are rejected.
+- Each action has a timeout. A watchdog reports an overrunning action as
+  timed out and starts a replacement worker, so the pool keeps its
+  capacity. Python cannot stop the hung thread; its result is discarded.
+- Every outcome (ok, error, timeout, rejected) is passed to on_complete as an
+  "action_complete" record, which the session controller writes to the journal.
+"""
+import time
+import heapq
+import itertools
+import threading
+
+EMERGENCY = 0
+NORMAL = 1
+PRIORITY_NAMES = {EMERGENCY: "emergency", NORMAL: "normal"}
+
+
+class ActionTicket:
+    def __init__(self, action_id, label, func, priority, timeout):
+        self.id = action_id
+        self.label = label
+        self.func = func
+        self.priority = priority
+        self.timeout = timeout
+        self.status = "queued"
+        self.error = None
+        self.submitted_at = time.monotonic()
+        self.started_at = None
+        self.finished_at = None
+        self.done = threading.Event()
+
+    def wait(self, timeout=None):
+        return self.done.wait(timeout)
+
+
+class ActionDispatcher:
+    def __init__(self, workers=2, maxsize=32, default_timeout=10.0, on_complete=None,
+                 clock=time.time, watchdog_interval=0.1):
+        self.maxsize = maxsize
+        self.default_timeout = default_timeout
+        self.on_complete = on_complete
+        self.clock = clock
+        self.watchdog_interval = watchdog_interval
+        self.last_ticket = None
+        self.counts = {"ok": 0, "error": 0, "timeout": 0, "rejected": 0}
+
+        self._heap = []
+        self._normal_queued = 0
+        self._running = {}
+        self._ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self._closed = False
+        self._threads = []
+
+        for _ in range(workers):
+            self._spawn((EMERGENCY, NORMAL))
+        self._spawn((EMERGENCY,))
+        self._watchdog = threading.Thread(target=self._watch, name="action-watchdog", daemon=True)
+        self._watchdog.start()
+
+    def _spawn(self, lanes):
+        thread = threading.Thread(target=self._work, args=(lanes,), name="action-worker", daemon=True)
+        self._threads.append(thread)
+        thread.start()
+
+    def submit(self, func, label=None, priority=NORMAL, timeout=None):
+        """Queue func() and return its ticket immediately."""
+        ticket = ActionTicket(next(self._ids), label, func, priority,
+                              self.default_timeout if timeout is None else timeout)
+        self.last_ticket = ticket
+        with self._cond:
+            if self._closed or (priority != EMERGENCY and self._normal_queued >= self.maxsize):
+                rejected = True
+            else:
+                rejected = False
+                heapq.heappush(self._heap, (priority, ticket.id, ticket))
+                if priority != EMERGENCY:
+                    self._normal_queued += 1
+                self._cond.notify_all()
+        if rejected:
+            self._finish(ticket, "rejected")
+        return ticket
+
+    def pending(self):
+        with self._cond:
+            return len(self._heap)
+
+    def _take(self, lanes):
+        with self._cond:
+            while True:
+                if self._heap and self._heap[0][0] in lanes:
+                    _, _, ticket = heapq.heappop(self._heap)
+                    if ticket.priority != EMERGENCY:
+                        self._normal_queued -= 1
+                    ticket.status = "running"
+                    ticket.started_at = time.monotonic()
+                    self._running[ticket] = lanes
+                    return ticket
+                # Emergency items sort first, so once closed a lane with nothing at the top has nothing left
+                if self._closed:
+                    return None
+                self._cond.wait()
+
+    def _work(self, lanes):
+        while True:
+            ticket = self._take(lanes)
+            if ticket is None:
+                return
+            try:
+                ticket.func()
+                status, error = "ok", None
+            except Exception as e:
+                status, error = "error", f"{type(e).__name__}: {e}"
+
+            with self._cond:
+                abandoned = ticket.status == "timeout"
+                self._running.pop(ticket, None)
+            if abandoned:
+                # The watchdog already reported this action and started a replacement worker
+                return
+            self._finish(ticket, status, error)
+
+    def _watch(self):
+        while True:
+            expired = []
+            with self._cond:
+                if self._closed and not self._heap and not self._running:
+                    return
+                now = time.monotonic()
+                for ticket, lanes in list(self._running.items()):
+                    if ticket.timeout and now - ticket.started_at > ticket.timeout:
+                        ticket.status = "timeout"
+                        del self._running[ticket]
+                        expired.append(ticket)
+                        if not self._closed:
+                            self._spawn(lanes)
+            for ticket in expired:
+                self._finish(ticket, "timeout", f"exceeded {ticket.timeout:.1f}s")
+            time.sleep(self.watchdog_interval)
+
+    def _finish(self, ticket, status, error=None):
+        ticket.status = status
+        ticket.error = error
+        ticket.finished_at = time.monotonic()
+        with self._cond:
+            self.counts[status] += 1
+        ticket.done.set()
+
+        if status == "error":
+            print(f"[WARN] Action '{ticket.label}' failed: {error}")
+        elif status == "timeout":
+            print(f"[WARN] Action '{ticket.label}' timed out after {ticket.timeout:.1f}s")
+        elif status == "rejected":
+            print(f"[WARN] Action queue full; dropped '{ticket.label}'")
+
+        if self.on_complete is None:
+            return
+        started = ticket.started_at or ticket.finished_at
+        record = {
+            "type": "action_complete",
+            "action_id": ticket.id,
+            "label": ticket.label,
+            "priority": PRIORITY_NAMES.get(ticket.priority, ticket.priority),
+            "status": status,
+            "error": error,
+            "queued_ms": (started - ticket.submitted_at) * 1000.0,
+            "run_ms": (ticket.finished_at - started) * 1000.0,
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.clock()))
+        }
+        try:
+            self.on_complete(record)
+        except Exception as e:
+            print(f"[WARN] Could not record completion of '{ticket.label}': {e}")
+
+    def shutdown(self, timeout=2.0):
+        """Stop accepting actions, let queued ones run, and wait up to `timeout` seconds for them."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        deadline = time.monotonic() + timeout
+        for thread in list(self._threads) + [self._watchdog]:
+            thread.join(max(0.0, deadline - time.monotonic()))
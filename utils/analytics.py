@@ -0,0 +1,384 @@
+"""Cross-session analytics over the session store.
+
+Usage:
+    python -m utils.analytics [--root data/user_data] [--user 99 42] [--json report.json]
+
+Every saved session is reduced once to typed rows: one row of summary
+numbers per session and one row per dwell event or card action. The rows are
+cached per user in <cache>/<user_id>.npz together with each session file's
+mtime and size. Later reports only re-parse sessions that were added or
+changed since; everything else loads straight from the cache.
+
+Reports are NumPy group-bys over those arrays (bincount sums, sorted group
+percentiles, per-group least-squares slopes), per user and for the whole
+cohort:
+
+- sessions and hours recorded;
+- card selections and blinks per minute;
+- dwell time mean / p50 / p90 (seconds from first looking at a target to
+  the trigger; older sessions that logged 0 there are left out);
+- emergency mode entries and failed card actions;
+- gaze radius and theta drift across sessions, per day.
+
+Legacy data/user_data/<id>.json files are read as they are, so those users
+are included without the report rewriting any user data; run
+`python -m utils.session_store migrate` to split them into session files.
+"""
+import os
+import json
+import math
+import time
+import argparse
+import numpy as np
+from utils.session_store import SessionStore
+
+# Columns of the per-session float array
+SESSION_FIELDS = (
+    "start", "duration", "total_frames", "total_blinks", "cards_selected", "card_flips",
+    "deck_activations", "emergency_mode_entries", "total_dwell_events", "avg_gaze_radius",
+    "avg_gaze_theta", "recovered",
+)
+S = {name: i for i, name in enumerate(SESSION_FIELDS)}
+
+# Event kinds
+DWELL = 0
+CARD_SELECTED = 1
+ACTION_OK = 2
+ACTION_FAILED = 3
+NAN = float("nan")
+
+
+_hours = {}
+
+
+def _epoch(value):
+    """Local "%Y-%m-%d %H:%M:%S" to epoch seconds. strptime runs once per hour; minutes and seconds are added."""
+    try:
+        hour = _hours.get(value[:13])
+        if hour is None:
+            hour = _hours[value[:13]] = time.mktime(time.strptime(value[:13], "%Y-%m-%d %H"))
+        return hour + int(value[14:16]) * 60 + int(value[17:19])
+    except (TypeError, ValueError):
+        return NAN
+
+
+def _number(value):
+    return NAN if value is None else float(value)
+
+
+def session_rows(payload):
+    """(session row, [(kind, time, dwell_time, avg_radius, avg_theta)]) for one saved session."""
+    summary = payload.get("summary", {})
+    start = _epoch(summary.get("start_time"))
+    end = _epoch(summary.get("end_time"))
+    row = [
+        start,
+        end - start,
+        summary.get("total_frames", 0),
+        summary.get("total_blinks", 0),
+        len(summary.get("cards_selected", [])),
+        summary.get("card_flips", 0),
+        summary.get("deck_activations", 0),
+        summary.get("emergency_mode_entries", 0),
+        summary.get("total_dwell_events", 0),
+        _number(summary.get("avg_gaze_radius")),
+        _number(summary.get("avg_gaze_theta")),
+        1.0 if summary.get("recovered") else 0.0,
+    ]
+
+    events = []
+    for event in payload.get("events", []):
+        kind = event.get("type")
+        if kind == "action_complete":
+            code = ACTION_OK if event.get("status") == "ok" else ACTION_FAILED
+        elif "action" in event:
+            code = CARD_SELECTED if kind == "card_selected" else DWELL
+        else:
+            continue
+        events.append((code, _epoch(event.get("timestamp")), _number(event.get("dwell_time")),
+                       _number(event.get("avg_radius")), _number(event.get("avg_theta"))))
+    return row, events
+
+
+class UserTable:
+    """Typed rows for one user's sessions, as cached on disk."""
+
+    def __init__(self, session_ids, stamps, sessions, ev_session, ev_kind, ev_time, ev_dwell, ev_radius, ev_theta):
+        self.session_ids = session_ids
+        self.stamps = stamps                # (mtime_ns, size) per session file
+        self.sessions = sessions            # float64 [n_sessions, len(SESSION_FIELDS)]
+        self.ev_session = ev_session        # int32 row index into sessions
+        self.ev_kind = ev_kind
+        self.ev_time = ev_time
+        self.ev_dwell = ev_dwell
+        self.ev_radius = ev_radius
+        self.ev_theta = ev_theta
+
+    EVENT_ARRAYS = ("ev_session", "ev_kind", "ev_time", "ev_dwell", "ev_radius", "ev_theta")
+
+    @classmethod
+    def build(cls, session_ids, stamps, parsed):
+        """parsed: [(row, events)] in session order."""
+        rows = [row for row, _ in parsed]
+        events = [(i,) + event for i, (_, evs) in enumerate(parsed) for event in evs]
+        ev = np.array(events, dtype=float).reshape(-1, 6)
+        return cls(np.array(session_ids, dtype=str), np.array(stamps, dtype=np.int64).reshape(-1, 2),
+                   np.array(rows, dtype=float).reshape(-1, len(SESSION_FIELDS)),
+                   ev[:, 0].astype(np.int32), ev[:, 1].astype(np.int8), ev[:, 2],
+                   ev[:, 3].astype(np.float32), ev[:, 4].astype(np.float32), ev[:, 5].astype(np.float32))
+
+    def select(self, keep):
+        """Sub-table of the session rows in `keep` (sorted indices), events remapped."""
+        remap = np.full(len(self.session_ids), -1, dtype=np.int32)
+        remap[keep] = np.arange(len(keep), dtype=np.int32)
+        mask = remap[self.ev_session] >= 0
+        arrays = [getattr(self, name)[mask] for name in self.EVENT_ARRAYS]
+        arrays[0] = remap[arrays[0]]
+        return UserTable(self.session_ids[keep], self.stamps[keep], self.sessions[keep], *arrays)
+
+    @staticmethod
+    def concat(tables):
+        tables = [t for t in tables if len(t.session_ids)]
+        if not tables:
+            return UserTable.build([], [], [])
+        offsets = np.cumsum([0] + [len(t.session_ids) for t in tables[:-1]])
+        arrays = [np.concatenate([getattr(t, name) for t in tables]) for name in UserTable.EVENT_ARRAYS]
+        arrays[0] = np.concatenate([t.ev_session + off for t, off in zip(tables, offsets)]).astype(np.int32)
+        return UserTable(np.concatenate([t.session_ids for t in tables]),
+                         np.concatenate([t.stamps for t in tables]),
+                         np.concatenate([t.sessions for t in tables]), *arrays)
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, session_ids=self.session_ids, stamps=self.stamps, sessions=self.sessions,
+                     **{name: getattr(self, name) for name in self.EVENT_ARRAYS})
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["session_ids"], data["stamps"], data["sessions"],
+                       *[data[name] for name in cls.EVENT_ARRAYS])
+
+
+class Analytics:
+    def __init__(self, root="data/user_data", cache_dir="data/analytics_cache"):
+        self.store = SessionStore(root)
+        self.cache_dir = cache_dir
+        self.parsed = 0
+        self.cached = 0
+
+    def user_table(self, user_id):
+        """The user's typed rows, re-parsing only sessions whose file changed since the cache was written."""
+        listed = []
+        for session_id, _ in self.store.list_sessions(user_id):
+            try:
+                st = os.stat(self.store.session_path(user_id, session_id))
+            except OSError:
+                continue
+            listed.append((session_id, (st.st_mtime_ns, st.st_size)))
+
+        # Sessions only in an unmigrated <id>.json share that file's stamp
+        legacy = {}
+        legacy_path = self.store.legacy_path(user_id)
+        if os.path.isfile(legacy_path):
+            _, legacy = self.store.read_legacy(legacy_path)
+            st = os.stat(legacy_path)
+            known_ids = {session_id for session_id, _ in listed}
+            legacy = {sid: payload for sid, payload in legacy.items() if sid not in known_ids}
+            listed.extend((sid, (st.st_mtime_ns, st.st_size)) for sid in legacy)
+        listed.sort()
+        session_ids = [session_id for session_id, _ in listed]
+        stamps = [stamp for _, stamp in listed]
+
+        cache_path = os.path.join(self.cache_dir, f"{user_id}.npz")
+        cached = None
+        if os.path.exists(cache_path):
+            try:
+                cached = UserTable.load(cache_path)
+            except (OSError, ValueError, KeyError):
+                print(f"[WARN] Ignoring unreadable analytics cache {cache_path}")
+        known = {}
+        if cached is not None:
+            for i, (session_id, stamp) in enumerate(zip(cached.session_ids, cached.stamps)):
+                known[(str(session_id), int(stamp[0]), int(stamp[1]))] = i
+
+        hits = [known.get((sid, m, size)) for sid, (m, size) in zip(session_ids, stamps)]
+        if cached is not None and len(cached.session_ids) == len(session_ids) and None not in hits \
+                and hits == list(range(len(hits))):
+            self.cached += len(hits)
+            return cached
+
+        # Reuse unchanged sessions, parse the rest, keep the store's session order
+        misses = [i for i, hit in enumerate(hits) if hit is None]
+        parsed = []
+        for i in misses:
+            payload = legacy.get(session_ids[i]) or self.store.get_session(user_id, session_ids[i]) or {}
+            parsed.append(session_rows(payload))
+        self.parsed += len(misses)
+        fresh = UserTable.build([session_ids[i] for i in misses], [stamps[i] for i in misses], parsed)
+        reused_at = [hit for hit in hits if hit is not None]
+        reused = cached.select(np.array(reused_at, dtype=np.int64)) if reused_at else UserTable.build([], [], [])
+        self.cached += len(reused_at)
+
+        table = UserTable.concat([reused, fresh])
+        order = np.argsort(table.session_ids, kind="stable")
+        table = table.select(order)
+        table.stamps = np.array(stamps, dtype=np.int64).reshape(-1, 2)
+        table.save(cache_path)
+        return table
+
+    def load(self, users=None):
+        """(user ids, per-session user codes, per-event user codes, combined table) for the cohort."""
+        users = users or sorted(set(self.store.list_users()) | set(self.store.legacy_users()))
+        tables = [self.user_table(user_id) for user_id in users]
+        session_user = np.repeat(np.arange(len(users)), [len(t.session_ids) for t in tables])
+        event_user = np.repeat(np.arange(len(users)), [len(t.ev_session) for t in tables])
+        return list(users), session_user, event_user, UserTable.concat(tables)
+
+
+# --- Vectorized group-bys ---
+def group_sum(codes, values, groups):
+    return np.bincount(codes, weights=values, minlength=groups)
+
+
+def group_percentiles(codes, values, groups, qs):
+    """Linear-interpolated percentiles per group, ignoring NaN. Returns [len(qs), groups]."""
+    valid = ~np.isnan(values)
+    codes, values = codes[valid], values[valid]
+    order = np.lexsort((values, codes))
+    values = values[order]
+    counts = np.bincount(codes, minlength=groups)
+    starts = np.cumsum(counts) - counts
+    has = counts > 0
+    out = np.full((len(qs), groups), NAN)
+    for j, q in enumerate(qs):
+        pos = starts[has] + (counts[has] - 1) * q
+        lo = np.floor(pos).astype(np.int64)
+        hi = np.minimum(lo + 1, starts[has] + counts[has] - 1)
+        out[j, has] = values[lo] + (values[hi] - values[lo]) * (pos - lo)
+    return out
+
+
+def group_slope(codes, x, y, groups):
+    """Least-squares slope of y over x per group (NaN pairs skipped; NaN with fewer than two points)."""
+    valid = ~(np.isnan(x) | np.isnan(y))
+    codes, x, y = codes[valid], x[valid], y[valid]
+    n = np.bincount(codes, minlength=groups).astype(float)
+    sx, sy = group_sum(codes, x, groups), group_sum(codes, y, groups)
+    sxx, sxy = group_sum(codes, x * x, groups), group_sum(codes, x * y, groups)
+    denominator = n * sxx - sx * sx
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where((n >= 2) & (denominator > 0), (n * sxy - sx * sy) / denominator, NAN)
+
+
+def _per(numerator, denominator):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominator > 0, numerator / denominator, NAN)
+
+
+def summarize(codes, event_codes, table, groups):
+    """Metric arrays (one value per group) for sessions grouped by `codes`."""
+    sessions = table.sessions
+    duration = np.nan_to_num(np.maximum(sessions[:, S["duration"]], 0.0))
+    minutes = group_sum(codes, duration, groups) / 60.0
+
+    dwell_mask = (table.ev_kind == DWELL) | (table.ev_kind == CARD_SELECTED)
+    dwell_codes = event_codes[dwell_mask]
+    dwell = table.ev_dwell[dwell_mask].astype(float)
+    # Sessions saved before dwell_time was recorded properly carry 0 there: unknown, not instant
+    dwell[dwell <= 0] = NAN
+    p50, p90 = group_percentiles(dwell_codes, dwell, groups, (0.5, 0.9))
+    dwell_valid = ~np.isnan(dwell)
+    dwell_mean = _per(group_sum(dwell_codes[dwell_valid], dwell[dwell_valid], groups),
+                      np.bincount(dwell_codes[dwell_valid], minlength=groups))
+
+    # Drift: slope across sessions against days since the first session; theta
+    # is taken relative to each group's circular mean so 359 -> 1 is +2, not -358
+    days = sessions[:, S["start"]] / 86400.0
+    theta = np.radians(sessions[:, S["avg_gaze_theta"]])
+    theta_ok = ~np.isnan(theta)
+    mean_theta = np.arctan2(group_sum(codes[theta_ok], np.sin(theta[theta_ok]), groups),
+                            group_sum(codes[theta_ok], np.cos(theta[theta_ok]), groups))
+    theta_offset = np.degrees(np.angle(np.exp(1j * (theta - mean_theta[codes]))))
+
+    failed = np.bincount(event_codes[table.ev_kind == ACTION_FAILED], minlength=groups)
+    return {
+        "sessions": np.bincount(codes, minlength=groups),
+        "hours": minutes / 60.0,
+        "selections_per_min": _per(group_sum(codes, sessions[:, S["cards_selected"]], groups), minutes),
+        "blinks_per_min": _per(group_sum(codes, sessions[:, S["total_blinks"]], groups), minutes),
+        "dwell_mean_s": dwell_mean,
+        "dwell_p50_s": p50,
+        "dwell_p90_s": p90,
+        "emergency_entries": group_sum(codes, sessions[:, S["emergency_mode_entries"]], groups),
+        "failed_actions": failed,
+        "radius_drift_per_day": group_slope(codes, days, sessions[:, S["avg_gaze_radius"]], groups),
+        "theta_drift_deg_per_day": group_slope(codes, days, theta_offset, groups),
+    }
+
+
+def build_report(analytics, users=None):
+    """{"users": {user_id: metrics}, "cohort": metrics} over every saved session."""
+    users, session_user, event_user, table = analytics.load(users)
+    per_user = summarize(session_user, event_user, table, len(users))
+    cohort = summarize(np.zeros_like(session_user), np.zeros_like(event_user), table, 1)
+
+    def row(metrics, i):
+        return {name: (None if math.isnan(float(values[i])) else float(values[i])) for name, values in metrics.items()}
+
+    return {
+        "users": {user_id: row(per_user, i) for i, user_id in enumerate(users)},
+        "cohort": row(cohort, 0),
+    }
+
+
+COLUMNS = (
+    ("sessions", "sess", "d"), ("hours", "hours", ".1f"), ("selections_per_min", "sel/min", ".2f"),
+    ("blinks_per_min", "blink/min", ".1f"), ("dwell_mean_s", "dwell", ".2f"), ("dwell_p50_s", "p50", ".2f"),
+    ("dwell_p90_s", "p90", ".2f"), ("emergency_entries", "emerg", "d"), ("failed_actions", "failed", "d"),
+    ("radius_drift_per_day", "r/day", "+.4f"), ("theta_drift_deg_per_day", "deg/day", "+.2f"),
+)
+
+
+def format_report(report):
+    lines = [f"{'user':>10} " + " ".join(f"{title:>9}" for _, title, _ in COLUMNS)]
+    rows = list(report["users"].items()) + [("cohort", report["cohort"])]
+    for user_id, metrics in rows:
+        cells = []
+        for name, _, spec in COLUMNS:
+            value = metrics[name]
+            if value is None:
+                cells.append(f"{'n/a':>9}")
+            else:
+                cells.append(format(int(value) if spec == "d" else value, spec).rjust(9))
+        lines.append(f"{user_id:>10} " + " ".join(cells))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-user and cohort trends over saved sessions.")
+    parser.add_argument("--root", default="data/user_data", help="Session store root")
+    parser.add_argument("--cache", default="data/analytics_cache", help="Directory for the per-user array cache")
+    parser.add_argument("--user", nargs="*", default=None, help="Only these users (default: all)")
+    parser.add_argument("--json", default=None, help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    analytics = Analytics(args.root, args.cache)
+    report = build_report(analytics, args.user)
+    elapsed = time.perf_counter() - started
+
+    print(format_report(report))
+    print(f"[INFO] {analytics.parsed + analytics.cached} session(s): {analytics.parsed} parsed, "
+          f"{analytics.cached} from cache, in {elapsed:.2f}s")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[INFO] Report written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
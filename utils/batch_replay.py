@@ -0,0 +1,158 @@
+"""Re-analyse a whole cohort of recorded sessions on a process pool.
+
+Usage:
+    python -m utils.batch_replay [--recordings data/user_data] [--out data/batch] [--workers 8]
+
+Recordings are discovered as <recordings>/<user_id>/recordings/<name>, where
+<name> is a video file or a directory of frames. Each worker process loads
+its own dlib detector/predictor once and reuses it for every recording it is
+given. Finished sessions are appended to <out>/<user_id>.jsonl as soon as
+they complete, so an interrupted run resumes by skipping recordings that
+already have a line in their user's file.
+"""
+import os
+import json
+import time
+import argparse
+import multiprocessing
+from utils.replay import load_user_config, run_replay
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv")
+
+_worker_gaze = None
+
+
+def discover_recordings(root):
+    """Return sorted (user_id, recording path) pairs found under root."""
+    recordings = []
+    if not os.path.isdir(root):
+        return recordings
+    for user_id in sorted(os.listdir(root)):
+        rec_dir = os.path.join(root, user_id, "recordings")
+        if not os.path.isdir(rec_dir):
+            continue
+        for name in sorted(os.listdir(rec_dir)):
+            path = os.path.join(rec_dir, name)
+            if os.path.isdir(path) or name.lower().endswith(VIDEO_EXTENSIONS):
+                recordings.append((user_id, path))
+    return recordings
+
+
+def load_completed(out_dir):
+    """Return the recording keys (paths relative to the recordings root) already in out_dir."""
+    done = set()
+    if not os.path.isdir(out_dir):
+        return done
+    for name in os.listdir(out_dir):
+        if not name.endswith(".jsonl"):
+            continue
+        with open(os.path.join(out_dir, name), "r") as f:
+            for line in f:
+                try:
+                    done.add(json.loads(line)["recording"])
+                except (ValueError, KeyError):
+                    # Torn final line from an interrupted run; that recording is redone
+                    continue
+    return done
+
+
+def _init_worker():
+    global _worker_gaze
+    from utils.gaze_base_extended.pupil_tracker import ExtendedGazeTracker
+    _worker_gaze = ExtendedGazeTracker()
+
+
+def _replay_task(task):
+    user_id, path, key, scratch_root = task
+    config = load_user_config(user_id)
+    _worker_gaze.reset()
+    _worker_gaze.detection_scale = config.get("detection_scale", 1.0)
+
+    started = time.perf_counter()
+    user = None
+    try:
+        user = run_replay(path, user_id, root=scratch_root, config=config, gaze=_worker_gaze)
+        payload = user.build_session_payload(config)
+    except Exception as e:
+        return {"user_id": user_id, "recording": key, "error": f"{e.__class__.__name__}: {e}"}
+    finally:
+        # The scratch journal only feeds the payload; never leave it (or its writer) behind
+        if user is not None:
+            user.journal.close()
+            try:
+                os.remove(user.journal.path)
+            except OSError:
+                pass
+    return {
+        "user_id": user_id,
+        "recording": key,
+        "session_id": user.session_id,
+        "frames": payload["summary"]["total_frames"],
+        "seconds": time.perf_counter() - started,
+        "payload": payload
+    }
+
+
+def run_batch(recordings_root="data/user_data", out_dir="data/batch", workers=None):
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(out_dir, exist_ok=True)
+    completed = load_completed(out_dir)
+    pending = []
+    for user_id, path in discover_recordings(recordings_root):
+        key = os.path.relpath(path, recordings_root)
+        if key not in completed:
+            pending.append((user_id, path, key))
+    print(f"[INFO] {len(pending)} recordings to process ({len(completed)} already done) on {workers} workers")
+    if not pending:
+        return
+
+    scratch_root = os.path.join(out_dir, "scratch")
+    tasks = [(user_id, path, key, scratch_root) for user_id, path, key in pending]
+    total_frames = 0
+    failures = 0
+    started = time.perf_counter()
+
+    with multiprocessing.Pool(processes=workers, initializer=_init_worker) as pool:
+        for i, result in enumerate(pool.imap_unordered(_replay_task, tasks), start=1):
+            if "error" in result:
+                failures += 1
+                print(f"[ERROR] {result['recording']}: {result['error']}")
+                continue
+
+            with open(os.path.join(out_dir, f"{result['user_id']}.jsonl"), "a") as f:
+                f.write(json.dumps(result, default=_to_builtin) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+            total_frames += result["frames"]
+            elapsed = time.perf_counter() - started
+            fps = total_frames / elapsed if elapsed else 0.0
+            print(f"[{i}/{len(tasks)}] user {result['user_id']} {os.path.basename(result['recording'])}: "
+                  f"{result['frames']} frames in {result['seconds']:.1f}s | "
+                  f"overall {fps:.1f} fps, {fps / workers:.1f} fps/core")
+
+    elapsed = time.perf_counter() - started
+    fps = total_frames / elapsed if elapsed else 0.0
+    print(f"[INFO] Done: {total_frames} frames in {elapsed:.1f}s ({fps:.1f} fps, {fps / workers:.1f} fps/core), "
+          f"{failures} failed")
+
+
+def _to_builtin(o):
+    if hasattr(o, "item"):
+        return o.item()
+    if hasattr(o, "tolist"):
+        return o.tolist()
+    raise TypeError(f"{o.__class__.__name__} not JSON serializable")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay every recorded session on a process pool.")
+    parser.add_argument("--recordings", default="data/user_data", help="Root holding <user_id>/recordings/")
+    parser.add_argument("--out", default="data/batch", help="Directory for per-user .jsonl results")
+    parser.add_argument("--workers", type=int, default=None, help="Defaults to the CPU count")
+    args = parser.parse_args()
+    run_batch(args.recordings, args.out, args.workers)
+
+
+if __name__ == "__main__":
+    main()
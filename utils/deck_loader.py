@@ -0,0 +1,123 @@
+"""Deck files and the compiled, array-backed deck tree DeckManager navigates.
+
+A deck file is JSON or YAML (YAML needs PyYAML): either a list of cards or
+{"cards": [...]}. A card is {"label": ..., "func": <action name>,
+"subdeck": [...], "priority": "emergency", "timeout": <seconds>}, or just a string for a phrase with no action (quote
+Yes/No in YAML, which would otherwise read them as booleans).
+
+compile_deck lays the tree out breadth-first, so every node's children are
+contiguous: moving to the next sibling, a child, the parent or any label is
+a single array or dict lookup however large the vocabulary is.
+"""
+import os
+import json
+from array import array
+from collections import deque
+
+ROOT = 0
+
+
+class CompiledDeck:
+    def __init__(self):
+        self.cards = [{"label": ""}]
+        self.parent = array("i", [-1])
+        self.position = array("i", [0])
+        self.first_child = array("i", [0])
+        self.child_count = array("i", [0])
+        self.next_sibling = array("i", [0])
+        self.paths = [()]
+        self.label_index = {}
+        self.path_index = {(): ROOT}
+
+    def __len__(self):
+        return len(self.cards) - 1
+
+    @property
+    def first_card(self):
+        return self.first_child[ROOT]
+
+    def children(self, node):
+        start = self.first_child[node]
+        return self.cards[start:start + self.child_count[node]]
+
+    def find(self, label):
+        """Node id of the shallowest card with this label (case-insensitive), or None."""
+        return self.label_index.get(label.strip().lower())
+
+    def find_path(self, path):
+        """Node id for a tuple of labels from the top level, or None."""
+        return self.path_index.get(tuple(path))
+
+
+def compile_deck(cards, actions=None):
+    """Compile nested card dicts into a CompiledDeck.
+
+    "func" may be a callable (Python decks) or a name looked up in `actions`
+    (deck files); unknown names are reported and the card keeps only its
+    label.
+    """
+    actions = actions or {}
+    deck = CompiledDeck()
+    pending = deque([(ROOT, cards or [])])
+    while pending:
+        node, children = pending.popleft()
+        deck.first_child[node] = len(deck.cards)
+        deck.child_count[node] = len(children)
+
+        for position, card in enumerate(children):
+            if not isinstance(card, dict):
+                card = {"label": str(card)}
+            child = len(deck.cards)
+            label = str(card.get("label", ""))
+            view = {"label": label}
+
+            func = card.get("func")
+            if isinstance(func, str):
+                if func in actions:
+                    view["func"] = actions[func]
+                else:
+                    print(f"[WARN] Deck card '{label}' uses unknown action '{func}'; ignoring it.")
+            elif callable(func):
+                view["func"] = func
+            # Dispatch hints: "priority": "emergency" jumps the action queue; "timeout" in seconds
+            for key in ("priority", "timeout"):
+                if key in card:
+                    view[key] = card[key]
+
+            deck.cards.append(view)
+            deck.parent.append(node)
+            deck.position.append(position)
+            deck.first_child.append(0)
+            deck.child_count.append(0)
+            deck.next_sibling.append(0)
+            deck.paths.append(deck.paths[node] + (label,))
+            deck.path_index.setdefault(deck.paths[child], child)
+            # Breadth-first order means the first label seen is the shallowest
+            deck.label_index.setdefault(label.strip().lower(), child)
+
+            if card.get("subdeck"):
+                pending.append((child, card["subdeck"]))
+
+    for node in range(1, len(deck.cards)):
+        parent = deck.parent[node]
+        deck.next_sibling[node] = deck.first_child[parent] + (deck.position[node] + 1) % deck.child_count[parent]
+    return deck
+
+
+def load_deck_file(path):
+    """Read a JSON or YAML deck file and return its list of cards."""
+    with open(path, "r") as f:
+        if os.path.splitext(path)[1].lower() in (".yaml", ".yml"):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError(f"PyYAML is required to load '{path}' (pip install pyyaml)")
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+
+    if isinstance(data, dict):
+        data = data.get("cards", [])
+    if not isinstance(data, list) or not data:
+        raise ValueError(f"Deck file '{path}' must contain a non-empty list of cards")
+    return data
@@ -1,6 +1,10 @@
+import os
 import time
+from array import array
 import cv2
-from utils.gaze_base_extended.pupil_tracker import ExtendedGazeTracker
+from ui.compositor import compositor
+from utils.deck_loader import CompiledDeck, ROOT, compile_deck, load_deck_file
+from utils.action_dispatcher import EMERGENCY, NORMAL
 
 # Action functions
 def yes(): print("Yes")
@@ -46,16 +50,56 @@ deck = [
     ]}
 ]
 
+# Action names deck files can use in "func"
+ACTIONS = {
+    "yes": yes, "no": no, "help": help, "emergency": emergency, "accident": accident,
+    "bathroom": bathroom, "hungry": hungry, "medicine": medicine, "uncomfortable": uncomfortable,
+    "thank_you": thank_you, "love_you": love_you, "appreciation": appreciation, "happy": happy,
+    "overwhelmed": overwhelmed, "upset": upset, "frustrated": frustrated, "sorry": sorry
+}
+
+def action_priority(card):
+    """Emergency lane for cards marked "priority": "emergency", or labelled Emergency."""
+    if card.get("priority") == "emergency" or card["label"].strip().lower() == "emergency":
+        return EMERGENCY
+    return NORMAL
+
 class DeckManager:
-    def __init__(self, deck, cooldown=1, selector=None):
-        self.root_deck = deck
-        self.deck_stack = [deck]
-        self.index_stack = [0]
+    """Blink/dwell navigation over a compiled deck (see utils.deck_loader).
+
+    The position is a single node id: next, select, back and jump are each
+    one array or dict lookup. Decks loaded with from_file are reloaded when
+    the file changes, keeping the current card if its path still exists.
+
+    With a UsageModel, every selection is recorded and each level is
+    re-ranked once as it is entered ("reorder": predicted card first, then
+    by frequency/recency; "predict": predicted card first only). The order
+    is stored as per-manager next/first arrays, so blinking stays O(1).
+    """
+
+    def __init__(self, deck, cooldown=1, selector=None, path=None, reload_interval=1.0,
+                 usage=None, order_mode="reorder", dispatcher=None):
+        self.root_deck = deck if isinstance(deck, CompiledDeck) else compile_deck(deck, ACTIONS)
+        self.dispatcher = dispatcher
+        self.last_ticket = None
+        self.usage = usage
+        self.order_mode = order_mode
+        self._reset_order()
+        self.node = self._arrange(ROOT)
         self.cooldown = cooldown
         self.selector = selector
         self.last_blink = 0
         self.active = False
 
+        self.path = path
+        self.reload_interval = reload_interval
+        self._mtime = os.path.getmtime(path) if path else None
+        self._next_reload_check = 0
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        return cls(compile_deck(load_deck_file(path), ACTIONS), path=path, **kwargs)
+
     def activate(self):
         self.active = True
         if self.selector:
@@ -63,8 +107,7 @@ class DeckManager:
 
     def deactivate(self):
         self.active = False
-        self.deck_stack = [self.root_deck]
-        self.index_stack = [0]
+        self.node = self._arrange(ROOT)
         if self.selector:
             self.selector.dwell_enabled = False
 
@@ -72,18 +115,16 @@ class DeckManager:
         return self.active
 
     def current_deck(self):
-        return self.deck_stack[-1]
+        return self.root_deck.children(self.root_deck.parent[self.node])
 
     def current_index(self):
-        return self.index_stack[-1]
+        return self.root_deck.position[self.node]
 
     def current_card(self):
-        deck = self.current_deck()
-        index = self.current_index() % len(deck)
-        return deck[index]
+        return self.root_deck.cards[self.node]
 
     def next(self):
-        self.index_stack[-1] += 1
+        self.node = self._next[self.node]
 
     def on_blink(self, now=None):
         """Only advance deck index."""
@@ -96,37 +137,103 @@ class DeckManager:
             return self.current_card()
         return None
 
-    def select(self):
+    def select(self, now=None):
+        """Open a subdeck or run the card's action. With a dispatcher the action is
+        only queued (see last_ticket), so the frame loop never waits on it."""
         card = self.current_card()
-        if "subdeck" in card:
-            self.deck_stack.append(card["subdeck"])
-            self.index_stack.append(0)
+        self.last_ticket = None
+        if self.usage is not None:
+            self.usage.observe(card["label"], now)
+        if self.root_deck.child_count[self.node]:
+            self.node = self._arrange(self.node)
         elif "func" in card:
-            card["func"]()
+            self.run_action(card)
         return card
 
+    def run_action(self, card):
+        """Run a card's func, queued on the dispatcher if there is one (see last_ticket)."""
+        self.last_ticket = None
+        if self.dispatcher is None:
+            card["func"]()
+        else:
+            self.last_ticket = self.dispatcher.submit(
+                card["func"], label=card["label"], priority=action_priority(card), timeout=card.get("timeout"))
+
     def back(self):
         """Return to previous deck level."""
-        if len(self.deck_stack) > 1:
-            self.deck_stack.pop()
-            self.index_stack.pop()
+        parent = self.root_deck.parent[self.node]
+        if parent != ROOT:
+            self.node = parent
+
+    def jump(self, label):
+        """Move straight to the card with this label. Returns the card, or None if there is none."""
+        node = self.root_deck.find(label)
+        if node is None:
+            return None
+        self.node = node
+        return self.current_card()
+
+    def _reset_order(self):
+        self._next = array("i", self.root_deck.next_sibling)
+        self._first = array("i", self.root_deck.first_child)
+
+    def _arrange(self, parent):
+        """Rank the children of `parent` by usage (if any). Returns the first card to show."""
+        deck = self.root_deck
+        start, count = deck.first_child[parent], deck.child_count[parent]
+        if self.usage is not None and count > 1:
+            labels = [deck.cards[node]["label"] for node in range(start, start + count)]
+            nodes = [start + i for i in self.usage.rank(labels, self.order_mode)]
+            self._first[parent] = nodes[0]
+            for node, following in zip(nodes, nodes[1:] + nodes[:1]):
+                self._next[node] = following
+        return self._first[parent]
+
+    def level_order(self, parent):
+        """Card node ids of one level in the order blinking visits them (re-ranked first)."""
+        first = node = self._arrange(parent)
+        order = []
+        while True:
+            order.append(node)
+            node = self._next[node]
+            if node == first:
+                return order
+
+    def reload_if_changed(self, now=None):
+        """Recompile the deck file if it changed on disk (checked at most every reload_interval seconds)."""
+        if not self.path:
+            return False
+        now = time.time() if now is None else now
+        if now < self._next_reload_check:
+            return False
+        self._next_reload_check = now + self.reload_interval
+
+        try:
+            mtime = os.path.getmtime(self.path)
+            if mtime == self._mtime:
+                return False
+            deck = compile_deck(load_deck_file(self.path), ACTIONS)
+        except Exception as e:
+            # A half-saved file stays broken until the next write; keep the current deck
+            print(f"[WARN] Could not reload deck '{self.path}': {e}")
+            return False
+
+        current_path = self.root_deck.paths[self.node]
+        self._mtime = mtime
+        self.root_deck = deck
+        self._reset_order()
+        self._arrange(ROOT)
+        self.node = deck.find_path(current_path) or self._first[ROOT]
+        if deck.parent[self.node] != ROOT:
+            self._arrange(deck.parent[self.node])
+        print(f"[INFO] Reloaded deck '{self.path}' ({len(deck)} cards)")
+        return True
 
     def draw(self, frame):
         if not self.active:
             return frame
 
         card = self.current_card()
-        text = f"{card['label']}"
-        font = cv2.FONT_HERSHEY_DUPLEX
-        scale = 1.2
-        thickness = 2
-        color = (0, 255, 0)
-
-        text_size, _ = cv2.getTextSize(text, font, scale, thickness)
-        text_width, text_height = text_size
-        text_x = (frame.shape[1] - text_width) // 2
-        text_y = 60
-
-        cv2.putText(frame, text, (text_x, text_y), font, scale, color, thickness, cv2.LINE_AA)
+        compositor.draw_centered_text(frame, f"{card['label']}", cv2.FONT_HERSHEY_DUPLEX, 1.2, (0, 255, 0), 2, y=60)
 
         return frame
@@ -0,0 +1,244 @@
+"""Live session events for caregiver dashboards over a local socket.
+
+Usage (print events as they happen, reconnecting and catching up after drops):
+    python -m utils.event_stream [--port 8765 | --socket /tmp/gaze-events.sock] [--since 0]
+
+Start the server with main.py --events-port 8765 (or --events-socket PATH).
+Clients connect over TCP on localhost or over a Unix socket. The protocol
+is one JSON object per line:
+
+- the server greets with {"type": "stream_hello", "stream_id": ..., "seq": <last seq>};
+- the client sends one line, e.g. {} or {"since": 41, "stream_id": "...",
+  "types": ["card_selected", "emergency_mode"]};
+- the server replays the remembered events after `since` and then streams
+  new ones. Every event carries an increasing "seq". A stream_id from an
+  earlier server run replays all remembered events. When events after
+  `since` were already forgotten, a "stream_gap" record comes first.
+
+publish() never blocks: it hands the record to a broadcast thread that
+encodes it once, keeps it in a ring buffer of recent events and copies it
+into each client's bounded queue. A client whose queue fills up is
+disconnected instead of slowing anyone else down; it reconnects with
+the last seq it saw and is caught up from the ring buffer.
+"""
+import os
+import json
+import time
+import uuid
+import queue
+import socket
+import argparse
+import threading
+from collections import deque
+
+_CLOSE = object()
+
+
+class _Client:
+    def __init__(self, conn, types, maxsize):
+        self.conn = conn
+        self.types = set(types) if types else None
+        self.queue = queue.Queue(maxsize)
+
+    def wants(self, kind):
+        return self.types is None or kind in self.types
+
+    def disconnect(self):
+        try:
+            self.conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class EventStream:
+    def __init__(self, port=8765, host="127.0.0.1", unix_path=None, history=512, client_queue=256,
+                 inbox_size=4096, hello_timeout=5.0):
+        self.port = port
+        self.host = host
+        self.unix_path = unix_path
+        self.client_queue = client_queue
+        self.hello_timeout = hello_timeout
+        self.stream_id = uuid.uuid4().hex[:12]
+        self.seq = 0
+        self.dropped = 0
+        self.disconnected = 0
+
+        self._inbox = queue.Queue(inbox_size)
+        self._history = deque(maxlen=history)  # (seq, type, encoded line)
+        self._clients = set()
+        self._lock = threading.Lock()
+        self._server = None
+        self._threads = []
+
+    def start(self):
+        if self.unix_path:
+            if os.path.exists(self.unix_path):
+                os.remove(self.unix_path)
+            self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._server.bind(self.unix_path)
+            address = self.unix_path
+        else:
+            self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            self._server.bind((self.host, self.port))
+            self.port = self._server.getsockname()[1]
+            address = f"{self.host}:{self.port}"
+        self._server.listen()
+
+        for name, target in (("events-accept", self._accept_loop), ("events-broadcast", self._broadcast_loop)):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        print(f"[INFO] Streaming session events on {address}")
+        return self
+
+    def publish(self, record):
+        """Queue a record (a dict with a "type") for every subscriber. Never blocks."""
+        try:
+            self._inbox.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        self._inbox.put(_CLOSE)
+        if self._server is not None:
+            try:
+                self._server.close()
+            except OSError:
+                pass
+        with self._lock:
+            clients = list(self._clients)
+        for client in clients:
+            client.disconnect()
+            try:
+                client.queue.put_nowait(None)
+            except queue.Full:
+                pass
+        for thread in self._threads:
+            thread.join(1.0)
+        if self.unix_path and os.path.exists(self.unix_path):
+            os.remove(self.unix_path)
+
+    def _broadcast_loop(self):
+        while True:
+            record = self._inbox.get()
+            if record is _CLOSE:
+                return
+            kind = record.get("type")
+            with self._lock:
+                self.seq += 1
+                line = (json.dumps(dict(record, seq=self.seq), default=str) + "\n").encode()
+                self._history.append((self.seq, kind, line))
+                for client in list(self._clients):
+                    if not client.wants(kind):
+                        continue
+                    try:
+                        client.queue.put_nowait(line)
+                    except queue.Full:
+                        # Too slow to keep up; it catches up from the ring buffer on reconnect
+                        self._clients.discard(client)
+                        self.disconnected += 1
+                        client.disconnect()
+
+    def _accept_loop(self):
+        while True:
+            try:
+                conn, _ = self._server.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._serve, args=(conn,), name="events-client", daemon=True).start()
+
+    def _serve(self, conn):
+        client = None
+        try:
+            conn.sendall(self._encode({"type": "stream_hello", "stream_id": self.stream_id, "seq": self.seq}))
+            conn.settimeout(self.hello_timeout)
+            try:
+                hello = json.loads(conn.makefile("rb").readline() or b"{}")
+            except (socket.timeout, ValueError):
+                hello = {}
+            conn.settimeout(None)
+
+            client = _Client(conn, hello.get("types"), self.client_queue)
+            since = hello.get("since")
+            if since is not None and hello.get("stream_id") not in (None, self.stream_id):
+                since = 0
+            with self._lock:
+                # Snapshot and subscribe together so nothing is missed or sent twice
+                backlog = self._backlog(since, client) if since is not None else []
+                self._clients.add(client)
+
+            for line in backlog:
+                conn.sendall(line)
+            while True:
+                line = client.queue.get()
+                if line is None:
+                    break
+                conn.sendall(line)
+        except OSError:
+            pass
+        finally:
+            if client is not None:
+                with self._lock:
+                    self._clients.discard(client)
+            conn.close()
+
+    def _backlog(self, since, client):
+        lines = []
+        if self._history and self._history[0][0] > since + 1:
+            lines.append(self._encode({"type": "stream_gap", "from": since + 1, "to": self._history[0][0] - 1}))
+        for seq, kind, line in self._history:
+            if seq > since and client.wants(kind):
+                lines.append(line)
+        return lines
+
+    @staticmethod
+    def _encode(record):
+        return (json.dumps(record) + "\n").encode()
+
+
+def listen(port=8765, host="127.0.0.1", unix_path=None, since=None, types=None):
+    """Print events from a running stream, reconnecting and resuming from the last seq seen."""
+    stream_id = None
+    while True:
+        try:
+            if unix_path:
+                conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                conn.connect(unix_path)
+            else:
+                conn = socket.create_connection((host, port))
+        except OSError:
+            time.sleep(1.0)
+            continue
+
+        with conn, conn.makefile("rb") as lines:
+            greeting = json.loads(lines.readline() or b"{}")
+            hello = {"types": types} if types else {}
+            if since is not None:
+                hello.update(since=since, stream_id=stream_id)
+            conn.sendall((json.dumps(hello) + "\n").encode())
+            stream_id = greeting.get("stream_id")
+            for line in lines:
+                record = json.loads(line)
+                since = record.get("seq", since)
+                print(json.dumps(record))
+        print("[WARN] Event stream disconnected; reconnecting...")
+        time.sleep(0.5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print live session events.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--socket", default=None, help="Unix socket path instead of TCP")
+    parser.add_argument("--since", type=int, default=None, help="Replay remembered events after this seq (0 for all)")
+    parser.add_argument("--types", nargs="*", default=None, help="Only these event types")
+    args = parser.parse_args()
+    try:
+        listen(args.port, args.host, args.socket, args.since, args.types)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
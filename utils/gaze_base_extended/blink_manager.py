@@ -1,31 +1,203 @@
-import time
+"""Blink gestures from the eye aspect ratio, independent of frame rate.
+
+The eye aspect ratio (EAR) of the six eye landmarks p1..p6 is
+(|p2-p6| + |p3-p5|) / (2 |p1-p4|): roughly 0.25-0.35 with the eye open and
+near 0 when it is shut. BlinkManager runs a two-state (open/closed) machine
+over it:
+
+- hysteresis: the eye closes below close_ratio x the open-eye baseline and
+  only reopens above open_ratio x baseline, so EAR noise around one
+  threshold can't produce a burst of blinks;
+- every duration is measured between sample timestamps, not frames, so the
+  same thresholds hold at 8 fps (low power) and 30 fps;
+- closures shorter than min_blink are noise; closures reaching long_blink
+  are a "long" blink, reported while the eye is still closed;
+- any three blinks ending within triple_window (2.5 s, as the per-frame
+  detector allowed) are reported as "triple" at once, since no larger
+  gesture exists;
+- otherwise blinks less than group_gap of open eye apart form one gesture,
+  reported once the eye has stayed open for group_gap: "single" or
+  "double". With group_gap 0 every blink is a "single", reported as soon
+  as the eye reopens.
+
+The baseline is seeded from the median EAR of the first `warmup` seconds
+(or given as initial_baseline, e.g. from calibration) and then follows the
+open-eye EAR with a time-based moving average, so thresholds adapt to each
+user's eye shape and camera angle. An eye that stays "closed" for
+max_closure means the baseline no longer fits (or the eyes are resting):
+the eye is treated as open again and the baseline is re-seeded, so dwell
+is never blocked for good.
+"""
+import math
+import statistics
+from array import array
+
+SINGLE = "single"
+DOUBLE = "double"
+TRIPLE = "triple"
+LONG = "long"
+GROUP_TYPES = {1: SINGLE, 2: DOUBLE, 3: TRIPLE}
+
+
+def eye_aspect_ratio(points):
+    """EAR of one eye from its six landmarks (x, y), in dlib's 36-41 / 42-47 order."""
+    (x1, y1), (x2, y2), (x3, y3), (x4, y4), (x5, y5), (x6, y6) = points
+    width = math.hypot(x4 - x1, y4 - y1)
+    if width <= 0:
+        return None
+    return (math.hypot(x2 - x6, y2 - y6) + math.hypot(x3 - x5, y3 - y5)) / (2.0 * width)
+
 
 class BlinkManager:
-    def __init__(self, cooldown=0.3):
-        self.cooldown = cooldown
-        self.timestamps = []
-        self.last_blink = 0
-
-    def register_blink(self, now):
-        if now - self.last_blink > self.cooldown:
-            self.last_blink = now
-            self.timestamps.append(now)
-            # Keep only the last 2.5 seconds of blinks
-            self.timestamps = [t for t in self.timestamps if now - t <= 2.5]
-            
-            if len(self.timestamps) >= 3:
-                self.timestamps.clear()
-                return "triple"
-            return "single"
+    def __init__(self, close_ratio=0.75, open_ratio=0.85, initial_baseline=None, baseline_tau=2.0,
+                 min_blink=0.05, long_blink=0.7, group_gap=0.5, triple_window=2.5, max_gap=0.25, history=16,
+                 warmup=1.0, max_closure=3.0):
+        self.close_ratio = close_ratio
+        self.open_ratio = open_ratio
+        self.baseline = initial_baseline
+        self.baseline_tau = baseline_tau
+        self.warmup = warmup
+        self.max_closure = max_closure
+        self.min_blink = min_blink
+        self.long_blink = long_blink
+        self.group_gap = group_gap
+        self.triple_window = triple_window
+        self.max_gap = max_gap
+
+        self.closed = False
+        self.closed_at = None
+        self.last_blink = None
+        self.blink_count = 0
+        # Physical blinks in the last reported gesture not already counted by an earlier one
+        self.gesture_blinks = 0
+        self._long_sent = False
+        self._last_seen = None
+        self._reported_upto = -math.inf
+        self._triple_upto = -math.inf
+        self._warmup_started = None
+        self._warmup_ears = []
+
+        # Start/end times of the most recent blinks, oldest overwritten first
+        self._starts = array("d", [0.0] * history)
+        self._ends = array("d", [0.0] * history)
+        self._head = 0
+        self._size = 0
+
+    def _push(self, start, end):
+        self._starts[self._head] = start
+        self._ends[self._head] = end
+        self._head = (self._head + 1) % len(self._ends)
+        self._size = min(self._size + 1, len(self._ends))
+
+    def recent_blinks(self):
+        """(start, end) of the remembered blinks, newest first."""
+        capacity = len(self._ends)
+        slots = [(self._head - 1 - i) % capacity for i in range(self._size)]
+        return [(self._starts[i], self._ends[i]) for i in slots]
+
+    def _pending(self):
+        """Blinks in the current, unreported group: newest first, while the open gaps stay within group_gap."""
+        capacity = len(self._ends)
+        count = 0
+        newer_start = None
+        for i in range(self._size):
+            slot = (self._head - 1 - i) % capacity
+            end = self._ends[slot]
+            if end <= self._reported_upto or (newer_start is not None and newer_start - end > self.group_gap):
+                break
+            count += 1
+            newer_start = self._starts[slot]
+        return count
+
+    def _triple(self):
+        """True if the last three blinks end within triple_window and none was part of an earlier triple."""
+        if self._size < 3:
+            return False
+        capacity = len(self._ends)
+        newest = self._ends[(self._head - 1) % capacity]
+        third = self._ends[(self._head - 3) % capacity]
+        return third > self._triple_upto and newest - third <= self.triple_window
+
+    def _unreported(self):
+        """Blinks that ended after the last reported gesture."""
+        capacity = len(self._ends)
+        count = 0
+        while count < self._size and self._ends[(self._head - 1 - count) % capacity] > self._reported_upto:
+            count += 1
+        return count
+
+    def update(self, timestamp, ear):
+        """Feed one sample's EAR (None when the eyes weren't found). Returns a gesture or None."""
+        if ear is None:
+            # Landmarks lost: hold a closure in progress briefly, then drop it unreported
+            if self.closed and self._last_seen is not None and timestamp - self._last_seen > self.max_gap:
+                self.closed = False
+                self.closed_at = None
+            return self._flush(timestamp)
+
+        dt = timestamp - self._last_seen if self._last_seen is not None else 0.0
+        self._last_seen = timestamp
+
+        if self.baseline is None:
+            self._seed(timestamp, ear)
+            return None
+
+        if not self.closed:
+            if ear < self.baseline * self.close_ratio:
+                self.closed = True
+                self.closed_at = timestamp
+                self._long_sent = False
+            else:
+                self.baseline += (ear - self.baseline) * (1.0 - math.exp(-max(dt, 0.0) / self.baseline_tau))
+                return self._flush(timestamp)
+
+        elif ear > self.baseline * self.open_ratio:
+            self.closed = False
+            duration = timestamp - self.closed_at
+            if not self._long_sent and duration >= self.min_blink:
+                self._push(self.closed_at, timestamp)
+                self.last_blink = timestamp
+                self.blink_count += 1
+                if self._triple():
+                    # Blinks already reported as singles/doubles aren't counted twice
+                    self.gesture_blinks = self._unreported()
+                    self._reported_upto = self._triple_upto = timestamp
+                    return TRIPLE
+            return self._flush(timestamp)
+
+        elif timestamp - self.closed_at >= self.max_closure:
+            # Too long to be a gesture: start over with a fresh baseline rather than block dwell
+            self.closed = False
+            self.closed_at = None
+            self.baseline = None
+            self._seed(timestamp, ear)
+            return None
+
+        if not self._long_sent and timestamp - self.closed_at >= self.long_blink:
+            self._long_sent = True
+            self.blink_count += 1
+            # A long closure ends any gesture in progress
+            self.gesture_blinks = 1
+            self._reported_upto = self._triple_upto = timestamp
+            return LONG
         return None
 
-        def on_blink(self, now=None):
-            """Advance deck if active and cooldown passed."""
-            if not self.active:
-                return None
-            now = now or time.time()
-            if now - self.last_blink > self.cooldown:
-                self.last_blink = now
-                card = self.next()
-                return card
-            return None
\ No newline at end of file
+    def _seed(self, timestamp, ear):
+        """Collect warm-up samples; the baseline is their median, since blinks are a minority of any second."""
+        if self._warmup_started is None:
+            self._warmup_started = timestamp
+        self._warmup_ears.append(ear)
+        if timestamp - self._warmup_started >= self.warmup:
+            self.baseline = statistics.median(self._warmup_ears)
+            self._warmup_started = None
+            self._warmup_ears = []
+
+    def _flush(self, now):
+        if self.closed or self.last_blink is None or now - self.last_blink < self.group_gap:
+            return None
+        count = self._pending()
+        if not count:
+            return None
+        self.gesture_blinks = count
+        self._reported_upto = self.last_blink
+        return GROUP_TYPES[min(count, 3)]
@@ -0,0 +1,191 @@
+import math
+from collections import deque
+
+DEFAULT_FILTER = {"type": "one_euro", "min_cutoff": 1.0, "beta": 1.0, "d_cutoff": 1.0}
+
+
+class GazeFilter:
+    """Smooths GazeSample ratios between ExtendedGazeTracker and GazeSelector.
+
+    Subclasses implement _filter(dt, x, y) on located, non-blinking samples.
+    Lost or blinking frames hold the last filtered point instead of feeding
+    garbage into the state, and a gap longer than reset_after seconds starts
+    the filter over so it never drags a stale position into a new fixation.
+    """
+
+    def __init__(self, reset_after=0.5, default_dt=1 / 30.0):
+        self.reset_after = reset_after
+        self.default_dt = default_dt
+        self.reset()
+
+    def reset(self):
+        self._last_time = None
+        self._last_point = None
+        self._reset()
+
+    def _reset(self):
+        pass
+
+    def _filter(self, dt, x, y):
+        return x, y
+
+    def apply(self, sample):
+        if not sample.located or sample.blinking or sample.x is None or sample.y is None:
+            if self._last_point is None:
+                return sample
+            return sample._replace(x=self._last_point[0], y=self._last_point[1])
+
+        t = sample.timestamp
+        if self._last_time is None or t is None:
+            dt = self.default_dt
+        else:
+            dt = t - self._last_time
+            if dt > self.reset_after:
+                self._reset()
+            if dt <= 0:
+                dt = self.default_dt
+        if t is not None:
+            self._last_time = t
+
+        x, y = self._filter(dt, sample.x, sample.y)
+        self._last_point = (x, y)
+        return sample._replace(x=x, y=y)
+
+
+class OneEuroFilter(GazeFilter):
+    """One-Euro filter (Casiez et al.): heavy smoothing while the gaze rests,
+    a higher cutoff as it moves, so saccades are followed with little lag.
+
+    min_cutoff (Hz) sets jitter suppression at rest; beta scales the cutoff
+    with speed in ratio units per second.
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=1.0, d_cutoff=1.0, **kwargs):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        super().__init__(**kwargs)
+
+    def _reset(self):
+        self._x = None
+        self._dx = (0.0, 0.0)
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def _filter(self, dt, x, y):
+        if self._x is None:
+            self._x = (x, y)
+            return x, y
+
+        px, py = self._x
+        a_d = self._alpha(self.d_cutoff, dt)
+        dx = a_d * (x - px) / dt + (1 - a_d) * self._dx[0]
+        dy = a_d * (y - py) / dt + (1 - a_d) * self._dx[1]
+        self._dx = (dx, dy)
+
+        a = self._alpha(self.min_cutoff + self.beta * math.hypot(dx, dy), dt)
+        self._x = (a * x + (1 - a) * px, a * y + (1 - a) * py)
+        return self._x
+
+
+class KalmanFilter(GazeFilter):
+    """Constant-velocity Kalman filter, one independent (position, velocity) state per axis.
+
+    process_noise is the white-acceleration spectral density and
+    measurement_noise the variance of a raw ratio reading; raising their
+    ratio tracks faster at the cost of more jitter.
+    """
+
+    def __init__(self, process_noise=1.0, measurement_noise=4e-4, **kwargs):
+        self.q = process_noise
+        self.r = measurement_noise
+        super().__init__(**kwargs)
+
+    def _reset(self):
+        self._axes = None
+
+    def _step(self, axis, z, dt):
+        p, v, p00, p01, p11 = axis
+
+        # Predict
+        p += v * dt
+        dt2 = dt * dt
+        p00 += dt * (2 * p01 + dt * p11) + self.q * dt2 * dt2 / 4
+        p01 += dt * p11 + self.q * dt2 * dt / 2
+        p11 += self.q * dt2
+
+        # Update with a position measurement
+        s = p00 + self.r
+        k0 = p00 / s
+        k1 = p01 / s
+        residual = z - p
+        p += k0 * residual
+        v += k1 * residual
+        p11 -= k1 * p01
+        p01 -= k0 * p01
+        p00 -= k0 * p00
+        return p, v, p00, p01, p11
+
+    def _filter(self, dt, x, y):
+        if self._axes is None:
+            self._axes = [(x, 0.0, self.r, 0.0, 1.0), (y, 0.0, self.r, 0.0, 1.0)]
+            return x, y
+
+        self._axes = [self._step(self._axes[0], x, dt), self._step(self._axes[1], y, dt)]
+        return self._axes[0][0], self._axes[1][0]
+
+
+class MedianFilter(GazeFilter):
+    """Sliding median over the last `window` samples per axis.
+
+    Removes single-frame spikes outright; adds (window - 1) / 2 frames of lag.
+    """
+
+    def __init__(self, window=5, **kwargs):
+        self.window = window
+        super().__init__(**kwargs)
+
+    def _reset(self):
+        self._xs = deque(maxlen=self.window)
+        self._ys = deque(maxlen=self.window)
+
+    @staticmethod
+    def _median(values):
+        ordered = sorted(values)
+        mid = len(ordered) // 2
+        if len(ordered) % 2:
+            return ordered[mid]
+        return (ordered[mid - 1] + ordered[mid]) / 2
+
+    def _filter(self, dt, x, y):
+        self._xs.append(x)
+        self._ys.append(y)
+        return self._median(self._xs), self._median(self._ys)
+
+
+FILTERS = {
+    "one_euro": OneEuroFilter,
+    "kalman": KalmanFilter,
+    "median": MedianFilter,
+}
+
+
+def build_filter(spec):
+    """Build a filter from a config dict such as {"type": "one_euro", "beta": 0.3}.
+
+    Returns None (raw samples) for a missing spec or {"type": "none"}.
+    """
+    if not spec:
+        return None
+    params = dict(spec)
+    kind = params.pop("type", "one_euro")
+    if kind in (None, "none"):
+        return None
+    cls = FILTERS.get(kind)
+    if cls is None:
+        print(f"[WARN] Unknown gaze filter '{kind}', using raw gaze.")
+        return None
+    return cls(**params)
@@ -0,0 +1,73 @@
+import numpy as np
+
+# Screen positions (fractions of the frame) shown during multi-point calibration
+CALIBRATION_TARGETS = [(x, y) for y in (0.15, 0.5, 0.85) for x in (0.15, 0.5, 0.85)]
+
+
+def _features(x, y, degree, one=1.0):
+    """Polynomial terms of a gaze point; pass an array of ones as `one` for arrays."""
+    if degree == 1:
+        return (one, x, y)
+    return (one, x, y, x * y, x * x, y * y)
+
+
+class GazeMapping:
+    """Per-user polynomial map from raw pupil ratios to screen fractions.
+
+    Fitted by least squares on the calibration points: a second-order
+    polynomial (6 terms per axis) with at least 6 points, an affine map with
+    3 to 5. The output lives in the same 0..1 space as the raw ratios, so
+    the selector's center and sectors mean screen positions afterwards.
+    """
+
+    def __init__(self, coef_x, coef_y, degree=2, residual=None):
+        # Plain tuples: for one point per frame, Python arithmetic beats NumPy call overhead
+        self.coef_x = tuple(float(c) for c in coef_x)
+        self.coef_y = tuple(float(c) for c in coef_y)
+        self.degree = degree
+        self.residual = residual
+
+    @classmethod
+    def fit(cls, raw_points, screen_points):
+        raw = np.asarray(raw_points, dtype=float)
+        screen = np.asarray(screen_points, dtype=float)
+        if len(raw) < 3:
+            raise ValueError(f"Need at least 3 calibration points, got {len(raw)}")
+
+        degree = 2 if len(raw) >= 6 else 1
+        design = np.column_stack(_features(raw[:, 0], raw[:, 1], degree, np.ones(len(raw))))
+        coef, _, _, _ = np.linalg.lstsq(design, screen, rcond=None)
+        error = design @ coef - screen
+        residual = float(np.sqrt((error ** 2).sum(axis=1).mean()))
+        return cls(coef[:, 0], coef[:, 1], degree, residual)
+
+    def apply(self, x, y):
+        cx, cy = self.coef_x, self.coef_y
+        if self.degree == 1:
+            return cx[0] + cx[1] * x + cx[2] * y, cy[0] + cy[1] * x + cy[2] * y
+        xy, xx, yy = x * y, x * x, y * y
+        return (cx[0] + cx[1] * x + cx[2] * y + cx[3] * xy + cx[4] * xx + cx[5] * yy,
+                cy[0] + cy[1] * x + cy[2] * y + cy[3] * xy + cy[4] * xx + cy[5] * yy)
+
+    def map_points(self, points):
+        """Vectorized apply over an (N, 2) array of raw ratios."""
+        points = np.asarray(points, dtype=float)
+        design = np.column_stack(_features(points[:, 0], points[:, 1], self.degree, np.ones(len(points))))
+        return design @ np.column_stack((self.coef_x, self.coef_y))
+
+    def apply_sample(self, sample):
+        if sample.x is None or sample.y is None:
+            return sample
+        x, y = self.apply(sample.x, sample.y)
+        return sample._replace(x=x, y=y)
+
+    def to_config(self):
+        return {"degree": self.degree, "coef_x": list(self.coef_x), "coef_y": list(self.coef_y),
+                "residual": self.residual}
+
+    @classmethod
+    def from_config(cls, data):
+        """Rebuild a mapping saved with to_config(); None when the user has no mapping yet."""
+        if not data:
+            return None
+        return cls(data["coef_x"], data["coef_y"], data.get("degree", 2), data.get("residual"))
@@ -1,79 +1,82 @@
 import time
-import math
 import cv2
-import numpy as np
 from ui.overlay import draw_selector_overlay
+from utils.online_stats import RunningStats, CircularStats
+from utils.gaze_base_extended.radial_layout import RadialLayout
 
 class GazeSelector:
-    def __init__(self, trigger_time=2, center=(0.5, 0.5), inner_radius=0.04, outer_radius=0.25):
+    def __init__(self, trigger_time=2, center=(0.5, 0.5), inner_radius=0.04, outer_radius=0.25, clock=time.time,
+                 layout=None):
         self.trigger_time = trigger_time
         self.center = center
+        self.clock = clock
         self.current_selection = None
         self.dwell_progress = 0.0
-        self.last_frame_time = time.time()
+        self.dwell_started = None
+        self.last_frame_time = clock()
         self.dwell_enabled = True
-        self._radius_buffer = []
-        self._theta_buffer = []
-
-        self.button_actions = {
-            "upper_left": {
-                "label": "Deactivate", "func": "toggle", "corner": (0, 0), "allow_dwell": True
-            },
-            "upper_right": {
-                "label": "Select", "func": "select_card", "corner": (1, 0), "allow_dwell": True
-            },
-        }
+        self._radius_stats = RunningStats()
+        self._theta_stats = CircularStats()
+        # Bumped whenever button labels change so cached overlays can be rebuilt
+        self.layout_version = 0
+
+        self.layout = RadialLayout(layout, center=center, inner_radius=inner_radius, outer_radius=outer_radius)
+        self.button_actions = self.layout.button_actions()
 
     def update_buttons(self, emergency_mode=False, deck_manager=None):
-        if emergency_mode and deck_manager and deck_manager.is_active():
-            self.button_actions["upper_left"]["label"] = "Deactivate"
-            self.button_actions["upper_left"]["allow_dwell"] = True
-            self.button_actions["upper_right"]["label"] = "Emergency"
-            self.button_actions["upper_right"]["allow_dwell"] = False
-        elif deck_manager and deck_manager.is_active():
-            self.button_actions["upper_left"]["label"] = "Deactivate"
-            self.button_actions["upper_left"]["allow_dwell"] = True
-            self.button_actions["upper_right"]["label"] = "Select"
-            self.button_actions["upper_right"]["allow_dwell"] = True
+        before = self._button_state()
+        self._set_buttons(emergency_mode=emergency_mode, deck_manager=deck_manager)
+        if self._button_state() != before:
+            self.layout_version += 1
+
+    def _button_state(self):
+        return tuple((key, data["label"], data["allow_dwell"]) for key, data in self.button_actions.items())
+
+    def _set_buttons(self, emergency_mode=False, deck_manager=None):
+        deck_active = bool(deck_manager and deck_manager.is_active())
+        if emergency_mode and deck_active:
+            fixed = {"upper_left": ("Deactivate", True), "upper_right": ("Emergency", False)}
+        elif deck_active:
+            fixed = {"upper_left": ("Deactivate", True), "upper_right": ("Select", True)}
         else:
-            self.button_actions["upper_left"]["label"] = "Blink to Activate"
-            self.button_actions["upper_left"]["allow_dwell"] = False
-            self.button_actions["upper_right"]["label"] = "Blink to Activate"
-            self.button_actions["upper_right"]["allow_dwell"] = False
+            fixed = {"upper_left": ("Blink to Activate", False), "upper_right": ("Blink to Activate", False)}
+
+        for key, data in self.button_actions.items():
+            if key in fixed:
+                data["label"], data["allow_dwell"] = fixed[key]
+            else:
+                # Extra layout targets keep their own label and only dwell while the deck is in use
+                data["allow_dwell"] = deck_active and not emergency_mode and data["func"] is not None
 
     def process(self, frame, gaze, deck_manager=None, emergency_mode=False):
+        event = self.update(gaze, deck_manager=deck_manager, emergency_mode=emergency_mode)
+        return draw_selector_overlay(frame, self), event
+
+    def update(self, gaze, deck_manager=None, emergency_mode=False):
+        """Advance dwell state for one gaze sample without drawing. Returns the triggered event, if any."""
         self.update_buttons(emergency_mode=emergency_mode, deck_manager=deck_manager)
-        height, width = frame.shape[:2]
         hor = gaze.horizontal_ratio()
         ver = gaze.vertical_ratio()
 
         r = theta = None
         new_selection = None
 
-        now = time.time()
+        now = self.clock()
         dt = now - self.last_frame_time
         self.last_frame_time = now
 
         if not self.dwell_enabled:
-            return draw_selector_overlay(frame, self), None
+            return None
 
         if hor is not None and ver is not None:
-            dx = hor - self.center[0]
-            dy = ver - self.center[1]
-            r = math.hypot(dx, dy)
-            theta = (math.degrees(math.atan2(dy, dx)) + 360) % 360
+            # Constant-time table lookup; the dead zone is the layout's inner radius
+            new_selection = self.layout.lookup(hor, ver)
 
+            # Exact polar coordinates are only needed for dwell statistics
             if self.current_selection:
-                self._radius_buffer.append(r)
-                self._theta_buffer.append(theta)
-
-            if r < 0.06:
-                dx = dy = 0  # suppress small jitters near center
-
-            if 210 <= theta < 250:
-                new_selection = "upper_left"
-            elif 275 <= theta < 320:
-                new_selection = "upper_right"
+                r, theta = self.layout.polar(hor, ver)
+                self._radius_stats.push(r)
+                self._theta_stats.push(theta)
 
         # Dwell logic
         if new_selection:
@@ -82,9 +85,10 @@ class GazeSelector:
                     self.dwell_progress += dt
                 else:
                     self.current_selection = new_selection
+                    self.dwell_started = now
                     self.dwell_progress = 0.0
-                    self._radius_buffer = []
-                    self._theta_buffer = []
+                    self._radius_stats.reset()
+                    self._theta_stats.reset()
         else:
             self.dwell_progress -= dt * 0.75
 
@@ -93,23 +97,23 @@ class GazeSelector:
         # Trigger event
         event = None
         if self.dwell_progress >= self.trigger_time and self.current_selection:
-            radius_arr = np.array(self._radius_buffer)
-            theta_arr = np.array(self._theta_buffer)
+            radius = self._radius_stats
+            angle = self._theta_stats
 
             # Radius stats
-            avg_r = float(np.mean(radius_arr))
-            std_r = float(np.std(radius_arr))
-            min_r = float(np.min(radius_arr))
-            max_r = float(np.max(radius_arr))
-            range_r = max_r - min_r
+            avg_r = radius.mean
+            std_r = radius.std
+            min_r = radius.min
+            max_r = radius.max
+            range_r = radius.range
             jitter_r = std_r / avg_r if avg_r != 0 else 0
 
-            # Theta stats
-            avg_t = float(np.mean(theta_arr))
-            std_t = float(np.std(theta_arr))
-            min_t = float(np.min(theta_arr))
-            max_t = float(np.max(theta_arr))
-            angular_range = (max_t - min_t) if max_t >= min_t else (360 + max_t - min_t)
+            # Theta stats (circular, so dwells across 0/360 stay contiguous)
+            avg_t = angle.mean
+            std_t = angle.std
+            min_t = angle.min
+            max_t = angle.max
+            angular_range = angle.range
             jitter_t = std_t / 360
 
             r_stats = {
@@ -119,7 +123,7 @@ class GazeSelector:
                 "max_radius": max_r,
                 "range_radius": range_r,
                 "gaze_jitter_radius": jitter_r,
-                "samples_radius": len(radius_arr)
+                "samples_radius": radius.count
             }
 
             t_stats = {
@@ -129,12 +133,14 @@ class GazeSelector:
                 "max_theta": max_t,
                 "angular_range_theta": angular_range,
                 "gaze_jitter_theta": jitter_t,
-                "samples_theta": len(theta_arr)
+                "samples_theta": angle.count
             }
 
             event = {
-                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now)),
                 "action": self.current_selection,
+                # Wall time from first looking at the target to the trigger, including any decay
+                "dwell_time": now - self.dwell_started,
                 "gaze_point": {"x": round(hor, 6), "y": round(ver, 6)},
                 "radius": round(r, 4) if r is not None else None,
                 "theta": round(theta, 4) if theta is not None else None,
@@ -144,7 +150,7 @@ class GazeSelector:
 
             self.dwell_progress = 0.0
             self.current_selection = None
-            self._radius_buffer = []
-            self._theta_buffer = []
+            self._radius_stats.reset()
+            self._theta_stats.reset()
 
-        return draw_selector_overlay(frame, self), event
+        return event
@@ -1,62 +1,261 @@
+import os
 import time
+import math
+import inspect
+import threading
+import cv2
+import dlib
 import numpy as np
+from collections import namedtuple
 from gaze.base.gaze_tracking import GazeTracking
+from gaze.base.gaze_tracking.eye import Eye
+from gaze.base.gaze_tracking.calibration import Calibration
+from utils.gaze_base_extended.blink_manager import eye_aspect_ratio
+
+
+class GazeSample(namedtuple("GazeSample", "timestamp x y located blinking ear", defaults=(None,))):
+    """Immutable gaze reading for one frame.
+
+    Exposes the same accessors as ExtendedGazeTracker so it can be handed to
+    GazeSelector in place of the live tracker. When the pupils are lost the
+    last known ratios are carried forward with located=False. ear is the mean
+    eye aspect ratio whenever eye landmarks were found (also mid-blink, when
+    the pupils usually are not), else None.
+    """
+    __slots__ = ()
+
+    def horizontal_ratio(self):
+        return self.x
+
+    def vertical_ratio(self):
+        return self.y
+
+    def is_blinking(self):
+        return self.blinking
+
+
+_models = None
+_models_lock = threading.Lock()
+
+
+def load_models():
+    """dlib 68-point landmark predictor, loaded once per process.
+
+    GazeTracking.__init__ loads it for every instance and the file takes a
+    noticeable part of startup. Concurrent callers (e.g. a background
+    preload racing the first tracker) wait for the one load. The predictor
+    is const and safe to share between threads; the face detector is not
+    (it scans each image in member state), so every tracker builds its own.
+    """
+    global _models
+    with _models_lock:
+        if _models is None:
+            model_dir = os.path.join(os.path.dirname(inspect.getfile(GazeTracking)), "trained_models")
+            _models = dlib.shape_predictor(os.path.join(model_dir, "shape_predictor_68_face_landmarks.dat"))
+        return _models
+
+
+def preload_models():
+    """Start loading the shared models on a daemon thread. Returns the thread."""
+    thread = threading.Thread(target=load_models, name="model-preload", daemon=True)
+    thread.start()
+    return thread
+
 
 class ExtendedGazeTracker(GazeTracking):
-    def __init__(self, dwell_threshold=1.0, debug=False):
-        super().__init__()
-        self._gaze_x = None
-        self._gaze_y = None
+    def __init__(self, dwell_threshold=1.0, debug=False, roi_tracking=True,
+                 redetect_interval=15, roi_padding=0.15, max_scale_change=0.25,
+                 detection_scale=1.0):
+        # Same state GazeTracking.__init__ sets up, but with the process-wide models
+        self.frame = None
+        self.eye_left = None
+        self.eye_right = None
+        self.calibration = Calibration()
+        # The detector's weights are compiled into dlib, so a private one is cheap
+        self._face_detector = dlib.get_frontal_face_detector()
+        self._predictor = load_models()
+        self.sample = GazeSample(None, None, None, False, False)
         self.dwell_threshold = dwell_threshold
         self.debug = debug
 
-    def refresh(self, frame):
+        # ROI tracking: after a full-frame detection, landmarks are predicted
+        # inside a padded box around the previous frame's landmarks until the
+        # re-detect interval expires or the eye geometry stops looking sane.
+        self.roi_tracking = roi_tracking
+        self.redetect_interval = redetect_interval
+        self.roi_padding = roi_padding
+        self.max_scale_change = max_scale_change
+        self._roi = None
+        self._ref_eye_distance = None
+        self._frames_since_detect = 0
+        self.detection_count = 0
+        self.tracking_count = 0
+        self.tracking_failures = 0
+
+        # Face detection can run on a downscaled copy of the grayscale frame;
+        # the box is mapped back so landmarks and pupils use full resolution.
+        self.detection_scale = detection_scale
+
+    def reset(self):
+        """Forget per-recording state (pupil threshold calibration, face ROI, last sample) but keep the loaded models."""
+        self.calibration = Calibration()
+        self.eye_left = None
+        self.eye_right = None
+        self._roi = None
+        self._ref_eye_distance = None
+        self._frames_since_detect = 0
+        self.sample = GazeSample(None, None, None, False, False)
+
+    def refresh(self, frame, timestamp=None):
         super().refresh(frame)
+        timestamp = time.time() if timestamp is None else timestamp
 
         if self.pupils_located:
-            self._cache_gaze_ratios()
+            self.sample = self._compute_sample(timestamp)
+        else:
+            self.sample = self.sample._replace(timestamp=timestamp, located=False, blinking=False,
+                                               ear=self._eye_aspect_ratio())
+        return self.sample
 
-    def _cache_gaze_ratios(self):
-        le = self.eye_left
-        re = self.eye_right
+    def _analyze(self):
+        frame = cv2.cvtColor(self.frame, cv2.COLOR_BGR2GRAY)
+
+        landmarks = None
+        if self._can_track():
+            landmarks = self._predictor(frame, self._roi)
+            if self._landmarks_plausible(landmarks, frame.shape):
+                self.tracking_count += 1
+                self._frames_since_detect += 1
+            else:
+                self.tracking_failures += 1
+                landmarks = None
+
+        if landmarks is None:
+            landmarks = self._detect(frame)
+
+        if landmarks is None:
+            self._roi = None
+            self.eye_left = None
+            self.eye_right = None
+            return
+
+        self._roi = self._roi_from_landmarks(landmarks, frame.shape)
+        self.eye_left = Eye(frame, landmarks, 0, self.calibration)
+        self.eye_right = Eye(frame, landmarks, 1, self.calibration)
+
+    def _can_track(self):
+        return (self.roi_tracking and self._roi is not None
+                and self._frames_since_detect < self.redetect_interval)
+
+    def _detect(self, frame):
+        """Full-frame face detection followed by landmark prediction."""
+        self.detection_count += 1
+        self._frames_since_detect = 0
+        face = self._detect_face(frame)
+        if face is None:
+            self._ref_eye_distance = None
+            return None
+        landmarks = self._predictor(frame, face)
+        self._ref_eye_distance = self._eye_distance(landmarks)
+        return landmarks
+
+    def _detect_face(self, frame):
+        scale = self.detection_scale
+        if scale >= 1.0:
+            faces = self._face_detector(frame)
+            return faces[0] if faces else None
 
-        # Horizontal (X)
-        le.x_min = min(p[0] for p in le.landmark_points)
-        le.x_max = max(p[0] for p in le.landmark_points)
-        re.x_min = min(p[0] for p in re.landmark_points)
-        re.x_max = max(p[0] for p in re.landmark_points)
+        small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        faces = self._face_detector(small)
+        if not faces:
+            return None
+        face = faces[0]
+        return dlib.rectangle(
+            int(face.left() / scale), int(face.top() / scale),
+            int(face.right() / scale), int(face.bottom() / scale)
+        )
 
-        le.x_abs = le.origin[0] + le.pupil.x
-        re.x_abs = re.origin[0] + re.pupil.x
+    @staticmethod
+    def _eye_distance(landmarks):
+        left = landmarks.part(36)
+        right = landmarks.part(45)
+        return math.hypot(right.x - left.x, right.y - left.y)
 
-        lx_ratio = (le.x_abs - le.x_min) / (le.x_max - le.x_min)
-        rx_ratio = (re.x_abs - re.x_min) / (re.x_max - re.x_min)
-        self._gaze_x = (lx_ratio + rx_ratio) / 2
+    def _landmarks_plausible(self, landmarks, shape):
+        """Reject tracked landmarks whose eye geometry no longer matches the last detection."""
+        height, width = shape[:2]
+        for i in (36, 39, 42, 45):
+            p = landmarks.part(i)
+            if not (0 <= p.x < width and 0 <= p.y < height):
+                return False
 
-        # Vertical (Y)
-        le.y_min = min(p[1] for p in le.landmark_points)
-        le.y_max = max(p[1] for p in le.landmark_points)
-        re.y_min = min(p[1] for p in re.landmark_points)
-        re.y_max = max(p[1] for p in re.landmark_points)
+        distance = self._eye_distance(landmarks)
+        if not self._ref_eye_distance or distance <= 0:
+            return False
+        if abs(distance / self._ref_eye_distance - 1) > self.max_scale_change:
+            return False
 
-        le.y_abs = le.origin[1] + le.pupil.y
-        re.y_abs = re.origin[1] + re.pupil.y
+        left_width = landmarks.part(39).x - landmarks.part(36).x
+        right_width = landmarks.part(45).x - landmarks.part(42).x
+        return 0 < left_width < distance and 0 < right_width < distance
 
-        ly_ratio = (le.y_abs - le.y_min) / (le.y_max - le.y_min)
-        ry_ratio = (re.y_abs - re.y_min) / (re.y_max - re.y_min)
-        self._gaze_y = (ly_ratio + ry_ratio) / 2
+    def _roi_from_landmarks(self, landmarks, shape):
+        height, width = shape[:2]
+        xs = [p.x for p in landmarks.parts()]
+        ys = [p.y for p in landmarks.parts()]
+        pad_x = int((max(xs) - min(xs)) * self.roi_padding)
+        pad_y = int((max(ys) - min(ys)) * self.roi_padding)
+        return dlib.rectangle(
+            max(0, min(xs) - pad_x), max(0, min(ys) - pad_y),
+            min(width - 1, max(xs) + pad_x), min(height - 1, max(ys) + pad_y)
+        )
+
+    def tracking_stats(self):
+        total = self.detection_count + self.tracking_count
+        return {
+            "detections": self.detection_count,
+            "tracked": self.tracking_count,
+            "tracking_failures": self.tracking_failures,
+            "tracked_ratio": self.tracking_count / total if total else 0.0
+        }
+
+    def _compute_sample(self, timestamp):
+        le = self.eye_left
+        re = self.eye_right
+
+        # (eye, landmark, xy) -> per-eye bounding extents in one pass
+        points = np.stack((le.landmark_points, re.landmark_points))
+        lo = points.min(axis=1)
+        span = points.max(axis=1) - lo
+        pupils = np.array((
+            (le.origin[0] + le.pupil.x, le.origin[1] + le.pupil.y),
+            (re.origin[0] + re.pupil.x, re.origin[1] + re.pupil.y)
+        ), dtype=float)
+        gaze_x, gaze_y = ((pupils - lo) / span).mean(axis=0)
+
+        # The upstream Eye leaves blinking as None when it can't measure the eye
+        ratios = [eye.blinking for eye in (le, re) if eye.blinking is not None]
+        blinking = bool(ratios) and sum(ratios) / len(ratios) > 5.0
+        sample = GazeSample(timestamp, float(gaze_x), float(gaze_y), True, bool(blinking), self._eye_aspect_ratio())
 
         if self.debug:
-            print(f"[DEBUG] gaze_x={self._gaze_x:.2f}, gaze_y={self._gaze_y:.2f}")
+            print(f"[DEBUG] gaze_x={sample.x:.2f}, gaze_y={sample.y:.2f}")
+        return sample
+
+    def _eye_aspect_ratio(self):
+        if self.eye_left is None or self.eye_right is None:
+            return None
+        left = eye_aspect_ratio(self.eye_left.landmark_points)
+        right = eye_aspect_ratio(self.eye_right.landmark_points)
+        if left is None or right is None:
+            return None
+        return (left + right) / 2
 
     def horizontal_ratio(self):
-        return self._gaze_x
+        return self.sample.x
 
     def vertical_ratio(self):
-        return self._gaze_y
-    
+        return self.sample.y
+
     def is_blinking(self):
-        if self.pupils_located:
-            ratio = (self.eye_left.blinking + self.eye_right.blinking) / 2
-            return ratio > 5.0
-        return False
\ No newline at end of file
+        return self.sample.blinking
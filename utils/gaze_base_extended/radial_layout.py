@@ -0,0 +1,114 @@
+import math
+import numpy as np
+
+# Two-target layout the selector has always used: theta ranges in degrees
+# measured from the gaze center with y pointing down (so 270 is straight up).
+DEFAULT_LAYOUT = [
+    {"key": "upper_left", "label": "Deactivate", "func": "toggle", "corner": (0, 0), "theta": (210, 250)},
+    {"key": "upper_right", "label": "Select", "func": "select_card", "corner": (1, 0), "theta": (275, 320)},
+]
+
+# Buttons are drawn as boxes a quarter of the frame wide and high (see ui.compositor)
+BUTTON_FRACTION = 0.25
+
+
+def button_sector(corner, center=(0.5, 0.5), size=BUTTON_FRACTION):
+    """(start, end) degrees a button box covers as seen from center, in screen fractions."""
+    x = corner[0] * (1 - size)
+    y = corner[1] * (1 - size)
+    mid = math.degrees(math.atan2(y + size / 2 - center[1], x + size / 2 - center[0]))
+    # Corner angles relative to the box's own direction, so sectors through 0/360 stay contiguous
+    offsets = [(math.degrees(math.atan2(cy - center[1], cx - center[0])) - mid + 180) % 360 - 180
+               for cx in (x, x + size) for cy in (y, y + size)]
+    return (round((mid + min(offsets)) % 360, 2), round((mid + max(offsets)) % 360, 2))
+
+
+def screen_layout(spec=None, center=(0.5, 0.5)):
+    """Layout whose sectors match the drawn buttons, for gaze already mapped to screen fractions.
+
+    DEFAULT_LAYOUT's sectors were tuned on raw pupil ratios; once a
+    calibrated gaze_mapping is active they no longer line up with the boxes.
+    """
+    return [dict(target, theta=button_sector(target["corner"], center)) for target in (spec or DEFAULT_LAYOUT)]
+
+
+class RadialLayout:
+    """Maps a gaze point to a target through a precomputed (hor, ver) grid.
+
+    Each target is an angular sector, optionally limited to its own ring
+    (radius range); targets without one use the layout's inner/outer radius.
+    Sector membership is resolved once per grid cell when the layout is
+    built, so lookup() costs two multiplications and an array index no
+    matter how many targets there are.
+
+    Spec entries: {"key", "label", "corner": (x_frac, y_frac),
+                   "theta": (start_deg, end_deg), "radius": (inner, outer)}
+    A sector whose start is greater than its end wraps through 0/360.
+    """
+
+    def __init__(self, spec=None, center=(0.5, 0.5), inner_radius=0.0, outer_radius=0.25, resolution=512):
+        self.spec = [dict(target) for target in (spec or DEFAULT_LAYOUT)]
+        self.center = center
+        self.inner_radius = inner_radius
+        self.outer_radius = outer_radius
+        self.resolution = resolution
+        self.keys = [target["key"] for target in self.spec]
+        self._build()
+
+    def _ring(self, target):
+        inner, outer = target.get("radius", (self.inner_radius, self.outer_radius))
+        return inner, outer
+
+    def _build(self):
+        extent = max(self._ring(target)[1] for target in self.spec)
+        self._x0 = self.center[0] - extent
+        self._y0 = self.center[1] - extent
+        self._scale = self.resolution / (2 * extent)
+
+        # Cell centers relative to the gaze center
+        offsets = (np.arange(self.resolution) + 0.5) / self._scale - extent
+        dx, dy = np.meshgrid(offsets, offsets)
+        r = np.hypot(dx, dy)
+        theta = (np.degrees(np.arctan2(dy, dx)) + 360) % 360
+
+        table = np.full((self.resolution, self.resolution), -1, dtype=np.int16)
+        # Reverse order so earlier spec entries win where sectors overlap
+        for index in reversed(range(len(self.spec))):
+            target = self.spec[index]
+            start, end = target["theta"]
+            inner, outer = self._ring(target)
+            if start <= end:
+                in_sector = (theta >= start) & (theta < end)
+            else:
+                in_sector = (theta >= start) | (theta < end)
+            table[in_sector & (r >= inner) & (r <= outer)] = index
+        # Nested lists: indexing a Python list is far cheaper than a NumPy scalar lookup
+        self._table = table.tolist()
+
+    def lookup(self, hor, ver):
+        """Return the target key under the gaze point, or None."""
+        fx = (hor - self._x0) * self._scale
+        fy = (ver - self._y0) * self._scale
+        if 0 <= fx < self.resolution and 0 <= fy < self.resolution:
+            index = self._table[int(fy)][int(fx)]
+            if index >= 0:
+                return self.keys[index]
+        return None
+
+    def polar(self, hor, ver):
+        """Exact (r, theta) of a gaze point around the layout center."""
+        dx = hor - self.center[0]
+        dy = ver - self.center[1]
+        return math.hypot(dx, dy), (math.degrees(math.atan2(dy, dx)) + 360) % 360
+
+    def button_actions(self):
+        """Initial selector button table for this layout."""
+        return {
+            target["key"]: {
+                "label": target.get("label", target["key"]),
+                "func": target.get("func"),
+                "corner": tuple(target.get("corner", (0, 0))),
+                "allow_dwell": True
+            }
+            for target in self.spec
+        }
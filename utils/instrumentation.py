@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import math
+import bisect
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+# Log-spaced bucket edges from 0.1 ms to ~10 s for whole-session histograms
+_BUCKET_EDGES_MS = [0.1 * (10 ** (i / 20)) for i in range(101)]
+
+
+def _percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    k = (len(sorted_values) - 1) * p / 100.0
+    lo = math.floor(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+class LatencyHistogram:
+    """Timings for one stage: a rolling window for live percentiles plus
+    fixed log-spaced buckets covering the whole session in bounded memory."""
+
+    def __init__(self, window=600):
+        self.window = deque(maxlen=window)
+        self.buckets = [0] * (len(_BUCKET_EDGES_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_ms = None
+
+    def record(self, ms):
+        self.window.append(ms)
+        self.buckets[bisect.bisect_left(_BUCKET_EDGES_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.last_ms = ms
+
+    def rolling(self, percentiles=(50, 95, 99)):
+        values = sorted(self.window)
+        return {f"p{p}": _percentile(values, p) for p in percentiles}
+
+    def session_percentile(self, p):
+        """Approximate whole-session percentile (upper bucket edge)."""
+        if not self.count:
+            return None
+        target = self.count * p / 100.0
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= target:
+                return _BUCKET_EDGES_MS[i] if i < len(_BUCKET_EDGES_MS) else self.max_ms
+        return self.max_ms
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.total_ms / self.count if self.count else None,
+            "max_ms": self.max_ms,
+            "rolling": self.rolling(),
+            "session": {f"p{p}": self.session_percentile(p) for p in (50, 95, 99)}
+        }
+
+
+class FrameProfiler:
+    """Per-stage frame timings for the capture -> gaze -> selection -> render path.
+
+    Each stage is written from a single thread (capture, inference or render),
+    so recording needs no locking.
+    """
+
+    STAGES = ("capture", "refresh", "filter", "select", "blink", "draw", "imshow", "end_to_end")
+
+    def __init__(self, window=600):
+        self.started = time.time()
+        self.histograms = {name: LatencyHistogram(window) for name in self.STAGES}
+
+    def record(self, stage, seconds):
+        hist = self.histograms.get(stage)
+        if hist is None:
+            hist = self.histograms[stage] = LatencyHistogram()
+        hist.record(seconds * 1000.0)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def rolling(self):
+        """{stage: {p50, p95, p99}} over the rolling window, in milliseconds."""
+        return {name: hist.rolling() for name, hist in self.histograms.items() if hist.count}
+
+    def export(self, path, extra=None):
+        """Write every stage's summary to a JSON metrics file."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        data = {
+            "started": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started)),
+            "ended": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "bucket_edges_ms": _BUCKET_EDGES_MS,
+            "stages": {name: dict(hist.summary(), buckets=hist.buckets)
+                       for name, hist in self.histograms.items()},
+            **(extra or {})
+        }
+        with open(path, "w") as f:
+            json.dump(data, f, indent=2)
+        return path
+
+
+class NullProfiler:
+    """Drop-in FrameProfiler that records nothing."""
+
+    def record(self, stage, seconds):
+        pass
+
+    def stage(self, name):
+        return nullcontext()
+
+
+class StartupProfiler:
+    """Wall-clock phases from process start to the first usable frame.
+
+    Phases may run on background threads (model load, camera open) and
+    overlap the foreground ones; report() lists each with its start offset
+    so the critical path is visible. Time spent waiting on the user (phases
+    in `waits`) is reported but excluded from the time-to-first-frame budget.
+    """
+
+    def __init__(self, origin=None, waits=("user_prompt",)):
+        self.origin = time.perf_counter() if origin is None else origin
+        self.waits = waits
+        self.phases = []
+        self.marks = {}
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            # list.append is atomic, so background threads can record too
+            self.phases.append((name, start - self.origin, time.perf_counter() - start))
+
+    def mark(self, name):
+        """Record a milestone once (e.g. first_frame); later calls are ignored."""
+        self.marks.setdefault(name, time.perf_counter() - self.origin)
+
+    def report(self):
+        waited = sum(duration for name, _, duration in self.phases if name in self.waits)
+        lines = ["[STARTUP] phase                start_ms  duration_ms"]
+        for name, start, duration in sorted(self.phases, key=lambda p: p[1]):
+            suffix = "  (user)" if name in self.waits else ""
+            lines.append(f"[STARTUP] {name:<20} {start * 1000:8.1f} {duration * 1000:12.1f}{suffix}")
+        for name, at in sorted(self.marks.items(), key=lambda m: m[1]):
+            lines.append(f"[STARTUP] {name:<20} {at * 1000:8.1f}  -> {(at - waited) * 1000:.1f} ms excluding user input")
+        return "\n".join(lines)
@@ -0,0 +1,101 @@
+import math
+
+
+class RunningStats:
+    """Streaming mean/std (Welford) with running min and max. O(1) memory and work per sample."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def push(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        self.min = value if self.min is None or value < self.min else self.min
+        self.max = value if self.max is None or value > self.max else self.max
+
+    @property
+    def variance(self):
+        # Population variance, matching np.var/np.std defaults
+        return self._m2 / self.count if self.count else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    @property
+    def range(self):
+        return self.max - self.min if self.count else 0.0
+
+
+class CircularStats:
+    """Streaming statistics for angles in degrees that treat 359 and 1 as 2 degrees apart.
+
+    The mean is the direction of the summed unit vectors and std is the
+    circular standard deviation sqrt(-2 ln R). min/max/range are tracked as
+    signed offsets from the first sample, so a cluster straddling 0/360
+    reports its true angular extent.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self._sin = 0.0
+        self._cos = 0.0
+        self._ref = None
+        self._min_offset = 0.0
+        self._max_offset = 0.0
+
+    def push(self, degrees):
+        rad = math.radians(degrees)
+        self._sin += math.sin(rad)
+        self._cos += math.cos(rad)
+        self.count += 1
+
+        if self._ref is None:
+            self._ref = degrees % 360
+            return
+        offset = (degrees - self._ref + 180) % 360 - 180
+        self._min_offset = min(self._min_offset, offset)
+        self._max_offset = max(self._max_offset, offset)
+
+    @property
+    def mean(self):
+        if not self.count:
+            return None
+        mean = math.degrees(math.atan2(self._sin, self._cos)) % 360
+        return 0.0 if mean >= 360 else mean
+
+    @property
+    def resultant_length(self):
+        """Mean resultant length R in [0, 1]; 1 means every sample points the same way."""
+        return math.hypot(self._sin, self._cos) / self.count if self.count else 0.0
+
+    @property
+    def std(self):
+        r = self.resultant_length
+        if r <= 0:
+            return 180.0
+        return math.degrees(math.sqrt(max(0.0, -2 * math.log(min(r, 1.0)))))
+
+    @property
+    def min(self):
+        return (self._ref + self._min_offset) % 360 if self.count else None
+
+    @property
+    def max(self):
+        return (self._ref + self._max_offset) % 360 if self.count else None
+
+    @property
+    def range(self):
+        return self._max_offset - self._min_offset
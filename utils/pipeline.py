@@ -0,0 +1,220 @@
+import time
+import threading
+from collections import deque
+import cv2
+from utils.instrumentation import NullProfiler
+
+
+class LatestFrameQueue:
+    """Bounded queue where readers only ever get the newest item.
+
+    Writers never block: when the queue is full the oldest item is dropped.
+    Readers take the newest item and discard anything older.
+    """
+
+    def __init__(self, maxsize=2):
+        self.maxsize = maxsize
+        self.dropped = 0
+        self.closed = False
+        self._items = deque()
+        self._cond = threading.Condition()
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify_all()
+
+    def get_latest(self, timeout=None):
+        with self._cond:
+            if not self._items and not self.closed:
+                self._cond.wait(timeout)
+            if not self._items:
+                return None
+            item = self._items.pop()
+            self.dropped += len(self._items)
+            self._items.clear()
+            return item
+
+    def depth(self):
+        return len(self._items)
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class StageStats:
+    """Rolling frames-per-second counter for one pipeline stage."""
+
+    def __init__(self, name, window=60):
+        self.name = name
+        self.count = 0
+        self._ticks = deque(maxlen=window)
+
+    def tick(self, now=None):
+        self._ticks.append(time.perf_counter() if now is None else now)
+        self.count += 1
+
+    def fps(self):
+        if len(self._ticks) < 2:
+            return 0.0
+        span = self._ticks[-1] - self._ticks[0]
+        return (len(self._ticks) - 1) / span if span > 0 else 0.0
+
+
+class FrameRateGovernor:
+    """Low-power capture pacing.
+
+    While the deck is inactive capture is throttled to idle_fps, which is
+    enough to catch the activation triple blink. Blink activity or an active
+    deck raise it to active_fps (None means as fast as the camera delivers)
+    for at least boost_seconds.
+    """
+
+    def __init__(self, idle_fps=8.0, active_fps=None, boost_seconds=5.0):
+        self.idle_fps = idle_fps
+        self.active_fps = active_fps
+        self.boost_seconds = boost_seconds
+        self.active = False
+        self._boost_until = 0.0
+        self._last_capture = 0.0
+
+    def set_active(self, active):
+        self.active = active
+
+    def notify_activity(self, now=None):
+        self._boost_until = (time.time() if now is None else now) + self.boost_seconds
+
+    def target_fps(self, now=None):
+        now = time.time() if now is None else now
+        if self.active or now < self._boost_until:
+            return self.active_fps
+        return self.idle_fps
+
+    def wait(self):
+        """Sleep until the next capture is due at the current target rate."""
+        fps = self.target_fps()
+        if fps:
+            remaining = self._last_capture + 1.0 / fps - time.time()
+            if remaining > 0:
+                time.sleep(remaining)
+        self._last_capture = time.time()
+
+
+class GazePipeline:
+    """Capture -> inference -> render pipeline around one webcam and tracker.
+
+    Capture and inference run on background threads connected by
+    latest-frame-wins queues. The render stage stays on the caller's thread
+    (cv2.imshow must run on the main thread) and pulls the newest
+    (frame, GazeSample) pair with next_sample().
+    """
+
+    STAGES = ("capture", "inference", "render")
+
+    def __init__(self, webcam, gaze, queue_size=2, report_interval=5.0, profiler=None,
+                 keep_frames=True, governor=None):
+        self.webcam = webcam
+        self.gaze = gaze
+        self.profiler = profiler or NullProfiler()
+        # Headless runs drop frames right after inference instead of handing them to the render stage
+        self.keep_frames = keep_frames
+        self.governor = governor
+        self.frames = LatestFrameQueue(queue_size)
+        self.samples = LatestFrameQueue(queue_size)
+        self.stats = {name: StageStats(name) for name in self.STAGES}
+        self.report_interval = report_interval
+        self._last_report = time.time()
+        self._stop = threading.Event()
+        self._threads = []
+        # First exception from a background stage; re-raised on the render thread
+        self.error = None
+
+    def start(self):
+        for name, target in (("capture", self._capture_loop), ("inference", self._inference_loop)):
+            thread = threading.Thread(target=self._run_stage, args=(name, target), name=f"gaze-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _run_stage(self, name, loop):
+        try:
+            loop()
+        except Exception as e:
+            print(f"[ERROR] Gaze pipeline {name} stage failed: {type(e).__name__}: {e}")
+            if self.error is None:
+                self.error = e
+            self.stop()
+
+    def _raise_failure(self):
+        if self.error is not None:
+            raise self.error
+
+    def running(self):
+        """False once stopped. Raises the error that stopped a background stage, if any."""
+        self._raise_failure()
+        return not self._stop.is_set()
+
+    def stop(self):
+        self._stop.set()
+        self.frames.close()
+        self.samples.close()
+
+    def join(self, timeout=2.0):
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _capture_loop(self):
+        while not self._stop.is_set():
+            if self.governor:
+                self.governor.wait()
+            with self.profiler.stage("capture"):
+                ret, frame = self.webcam.read()
+            if not ret:
+                print("Failed to capture frame.")
+                self.stop()
+                break
+            frame = cv2.flip(frame, 1)
+            self.stats["capture"].tick()
+            self.frames.put((time.time(), frame))
+
+    def _inference_loop(self):
+        while not self._stop.is_set():
+            item = self.frames.get_latest(timeout=0.5)
+            if item is None:
+                continue
+            captured_at, frame = item
+            with self.profiler.stage("refresh"):
+                sample = self.gaze.refresh(frame, captured_at)
+            self.stats["inference"].tick()
+            self.samples.put((frame if self.keep_frames else None, sample))
+
+    def next_sample(self, timeout=1.0):
+        """Return the newest (frame, sample) pair, or None if nothing arrived in time.
+
+        frame is None when the pipeline was built with keep_frames=False.
+        Raises the error that stopped a background stage, if any.
+        """
+        item = self.samples.get_latest(timeout)
+        if item is None:
+            self._raise_failure()
+        else:
+            self.stats["render"].tick()
+        return item
+
+    def summary(self):
+        fps = ", ".join(f"{name}={stats.fps():.1f}fps" for name, stats in self.stats.items())
+        face = self.gaze.tracking_stats()
+        return (f"{fps} | frame_queue={self.frames.depth()}/{self.frames.maxsize} "
+                f"(dropped {self.frames.dropped}) | sample_queue={self.samples.depth()}/{self.samples.maxsize} "
+                f"(dropped {self.samples.dropped}) | face detections={face['detections']} "
+                f"tracked={face['tracked']} ({face['tracked_ratio']:.0%})")
+
+    def report_if_due(self, now=None):
+        now = time.time() if now is None else now
+        if now - self._last_report >= self.report_interval:
+            self._last_report = now
+            print(f"[PERF] {self.summary()}")
@@ -0,0 +1,141 @@
+"""Headless replay of recorded sessions through the full selection stack.
+
+Usage:
+    python -m utils.replay <video file | frame directory> --user 99 [--out data/replay]
+
+Frames are fed as fast as the tracker can process them. The selector, blink
+manager and session log read a replay clock that follows the frame
+timestamps, so dwell timing matches the original recording. The result is
+saved through UserBuilder.save_session_data under --out, in the same
+session format as live sessions.
+"""
+import os
+import json
+import time
+import argparse
+import cv2
+from utils.gaze_base_extended.pupil_tracker import ExtendedGazeTracker
+from utils.session_builder import UserBuilder
+from utils.session_controller import build_controller, controller_options
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp")
+
+
+class ReplayClock:
+    """Clock whose time only moves when the replay advances to the next frame."""
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+
+def video_frames(path, fps=None):
+    """Yield (seconds since start, frame) pairs from a video file."""
+    video = cv2.VideoCapture(path)
+    if not video.isOpened():
+        raise IOError(f"Could not open video '{path}'")
+    fps = fps or video.get(cv2.CAP_PROP_FPS) or 30.0
+    index = 0
+    try:
+        while True:
+            ret, frame = video.read()
+            if not ret:
+                break
+            pos_ms = video.get(cv2.CAP_PROP_POS_MSEC)
+            yield (pos_ms / 1000.0 if pos_ms > 0 else index / fps), frame
+            index += 1
+    finally:
+        video.release()
+
+
+def directory_frames(path, fps=30.0):
+    """Yield (seconds since start, frame) pairs from a directory of image files sorted by name."""
+    names = sorted(n for n in os.listdir(path) if n.lower().endswith(IMAGE_EXTENSIONS))
+    for index, name in enumerate(names):
+        frame = cv2.imread(os.path.join(path, name))
+        if frame is not None:
+            yield index / fps, frame
+
+
+def recording_frames(path, fps=None):
+    if os.path.isdir(path):
+        return directory_frames(path, fps or 30.0)
+    return video_frames(path, fps)
+
+
+def load_user_config(user_id, config_path=None):
+    path = config_path or f"data/configs/{user_id}.json"
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            return json.load(f)
+    return {}
+
+
+def run_replay(path, user_id, root="data/replay", session_id=None, config=None,
+               gaze=None, fps=None, start_time=None, flip=True, trace=False):
+    """Run one recording through the stack. Returns the UserBuilder holding the unsaved session.
+
+    With trace, every frame is also recorded under <root>/traces/<user_id>/<session_id>.
+    """
+    config = config if config is not None else load_user_config(user_id)
+    start = start_time if start_time is not None else os.path.getmtime(path)
+    session_id = session_id or os.path.splitext(os.path.basename(path.rstrip("/")))[0]
+
+    clock = ReplayClock(start)
+    user = UserBuilder(user_id, root=root, clock=clock)
+    # Replays reuse the recording name as session id; never append to a crashed run's journal
+    user.init_session_stats(session_id, fresh=True)
+    trace_dir = f"{root}/traces/{user_id}/{session_id}" if trace else None
+    controller = build_controller(user, clock=clock, trace_dir=trace_dir, **controller_options(config))
+    gaze = gaze or ExtendedGazeTracker(detection_scale=config.get("detection_scale", 1.0))
+
+    try:
+        for offset, frame in recording_frames(path, fps):
+            clock.now = start + offset
+            if flip:
+                frame = cv2.flip(frame, 1)
+            controller.step(gaze.refresh(frame, clock.now))
+    except BaseException:
+        controller.close()
+        user.journal.close()
+        raise
+    controller.close()
+    return user
+
+
+def replay_recording(path, user_id, root="data/replay", config=None, **kwargs):
+    """Replay one recording and save it under root. Returns the session summary."""
+    config = config if config is not None else load_user_config(user_id)
+    user = run_replay(path, user_id, root=root, config=config, **kwargs)
+    user.save_session_data(config=config)
+    return user.session_summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded session without a camera or window.")
+    parser.add_argument("path", help="Video file or directory of frames")
+    parser.add_argument("--user", required=True, help="User ID the recording belongs to")
+    parser.add_argument("--out", default="data/replay", help="Data root to write results under")
+    parser.add_argument("--session-id", default=None, help="Defaults to the recording name")
+    parser.add_argument("--config", default=None, help="Calibration config (defaults to data/configs/<user>.json)")
+    parser.add_argument("--fps", type=float, default=None, help="Frame rate for frame directories or videos without timestamps")
+    parser.add_argument("--start-time", type=float, default=None, help="Epoch seconds of the first frame (defaults to file mtime)")
+    parser.add_argument("--no-flip", action="store_true", help="Recording is already mirrored")
+    parser.add_argument("--trace", action="store_true", help="Also record per-frame traces under <out>/traces")
+    args = parser.parse_args()
+
+    config = load_user_config(args.user, args.config)
+    started = time.perf_counter()
+    summary = replay_recording(args.path, args.user, root=args.out, session_id=args.session_id,
+                               config=config, fps=args.fps, start_time=args.start_time,
+                               flip=not args.no_flip, trace=args.trace)
+    elapsed = time.perf_counter() - started
+    frames = summary["total_frames"]
+    print(f"[INFO] Replayed {frames} frames in {elapsed:.1f}s ({frames / elapsed if elapsed else 0:.1f} fps)")
+    print(f"[INFO] {summary['total_dwell_events']} dwell events, cards selected: {summary['cards_selected']}")
+
+
+if __name__ == "__main__":
+    main()
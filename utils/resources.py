@@ -0,0 +1,65 @@
+import threading
+from contextlib import nullcontext
+
+
+class SharedResources:
+    """One camera and one gaze tracker per process, borrowed by calibration and the main loop.
+
+    Both are created on first use. preload() creates them on a background
+    thread (e.g. while the user types their ID), so by the time calibration
+    asks for them the predictor is loaded and the device is open. The camera
+    is opened exactly once: reopening a USB camera right after releasing it
+    is slow and sometimes fails.
+
+    cv2 and the tracker module (dlib, gaze_tracking) are imported on first
+    use, so constructing this and calling preload() costs the caller nothing.
+    """
+
+    def __init__(self, camera_index=0, detection_scale=1.0, startup=None):
+        self.camera_index = camera_index
+        self.detection_scale = detection_scale
+        self.startup = startup
+        self._camera = None
+        self._tracker = None
+        self._camera_lock = threading.Lock()
+        self._tracker_lock = threading.Lock()
+        self._preload_thread = None
+
+    def preload(self):
+        if self._preload_thread is None:
+            self._preload_thread = threading.Thread(target=self._preload, name="resource-preload", daemon=True)
+            self._preload_thread.start()
+        return self._preload_thread
+
+    def _preload(self):
+        self.tracker()
+        self.camera()
+
+    def _phase(self, name):
+        return self.startup.phase(name) if self.startup else nullcontext()
+
+    def camera(self):
+        with self._camera_lock:
+            if self._camera is None:
+                with self._phase("import_cv2"):
+                    import cv2
+                with self._phase("open_camera"):
+                    self._camera = cv2.VideoCapture(self.camera_index)
+                if not self._camera.isOpened():
+                    print(f"[ERROR] Could not open camera {self.camera_index}.")
+            return self._camera
+
+    def tracker(self):
+        with self._tracker_lock:
+            if self._tracker is None:
+                with self._phase("import_tracker"):
+                    from utils.gaze_base_extended.pupil_tracker import ExtendedGazeTracker
+                with self._phase("load_models"):
+                    self._tracker = ExtendedGazeTracker(detection_scale=self.detection_scale)
+            return self._tracker
+
+    def release(self):
+        with self._camera_lock:
+            if self._camera is not None:
+                self._camera.release()
+                self._camera = None
@@ -3,25 +3,36 @@ import os
 import json
 import time
 import numpy as np
-from utils.gaze_base_extended.pupil_tracker import ExtendedGazeTracker
-from utils.gaze_base_extended.gaze_selector import GazeSelector
+from utils.gaze_base_extended.gaze_filter import DEFAULT_FILTER
+from utils.gaze_base_extended.gaze_mapping import GazeMapping, CALIBRATION_TARGETS
+from ui.overlay import draw_calibration_target
+from utils.session_journal import SessionJournal, read_journal
+from utils.session_store import SessionStore
+from utils.online_stats import RunningStats, CircularStats
+from utils.usage_model import UsageModel
 
 class UserBuilder:
-    def __init__(self, user_id):
+    def __init__(self, user_id, root="data", clock=time.time):
         self.user_id = str(user_id)
-        self.account_path = "data/users/account.json"
-        self.config_path = f"data/configs/{self.user_id}.json"
+        self.root = root
+        self.clock = clock
+        self.account_path = f"{root}/users/account.json"
+        self.config_path = f"{root}/configs/{self.user_id}.json"
         self._ensure_dirs()
+        self.store = SessionStore(f"{root}/user_data", default=self._convert)
+        self._migrate_legacy_user_data()
         self.session_id = None
         self.session_summary = {}
-        self.session_events = []
-        self.r = []
-        self.theta = []
+        self.journal = None
+        self.usage = None
 
     def _ensure_dirs(self):
-        os.makedirs("data/users", exist_ok=True)
-        os.makedirs("data/configs", exist_ok=True)
-        os.makedirs("data/user_data", exist_ok=True)
+        os.makedirs(f"{self.root}/users", exist_ok=True)
+        os.makedirs(f"{self.root}/configs", exist_ok=True)
+        os.makedirs(f"{self.root}/user_data", exist_ok=True)
+
+    def _timestamp(self):
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.clock()))
 
     def _convert(self, o):
         if isinstance(o, (np.integer, np.floating)):
@@ -30,18 +41,15 @@ class UserBuilder:
             return o.tolist()
         raise TypeError(f"{o.__class__.__name__} not JSON serializable")
 
-    def _user_data_path(self):
-        return f"data/user_data/{self.user_id}.json"
-
-    def _load_user_data(self):
-        if os.path.exists(self._user_data_path()):
-            with open(self._user_data_path(), "r") as f:
-                return json.load(f)
-        return {"user_id": self.user_id}
+    def _migrate_legacy_user_data(self):
+        legacy_path = f"{self.root}/user_data/{self.user_id}.json"
+        if os.path.exists(legacy_path):
+            count = self.store.migrate_legacy(legacy_path)
+            print(f"[INFO] Migrated {count} legacy session(s) for user '{self.user_id}' to per-session storage.")
 
-    def _save_user_data(self, data):
-        with open(self._user_data_path(), "w") as f:
-            json.dump(data, f, indent=2, default=self._convert)
+    def load_user_data(self):
+        """Build the nested {user_id, <session_id>: {...}} payload from the session store."""
+        return self.store.export_user(self.user_id)
 
     def create_user(self, metadata=None):
         users = self._load_account_registry()
@@ -76,10 +84,26 @@ class UserBuilder:
         with open(self.config_path, "w") as f:
             json.dump(config, f, indent=2, default=self._convert)
 
-    def calibrate(self):
+    def calibrate(self, gaze=None, webcam=None, multi_point=True, recalibrate=False,
+                  targets=CALIBRATION_TARGETS, settle=0.8, collect=1.0):
+        """Warm up the pupil threshold, then (multi_point) fit the raw ratio -> screen mapping.
+
+        Pass the session's shared gaze tracker and webcam to calibrate on the
+        instances the main loop will use; they are left open. Without them a
+        private tracker and camera are created and the camera is released.
+
+        Each target is shown for `settle` seconds before `collect` seconds of
+        located, non-blinking samples are taken; their median is one fit point.
+        A saved gaze_mapping is reused unless recalibrate is set; it is also
+        kept without multi_point or if too few targets were fixated.
+        """
         print("[INFO] Please look straight at the screen for calibration...")
-        gaze = ExtendedGazeTracker()
-        webcam = cv2.VideoCapture(0)
+        owns_webcam = webcam is None
+        if gaze is None:
+            # Imported here so loading user data never pulls in dlib and the landmark model
+            from utils.gaze_base_extended.pupil_tracker import ExtendedGazeTracker
+            gaze = ExtendedGazeTracker()
+        webcam = webcam or cv2.VideoCapture(0)
 
         frame = None
         for _ in range(20):
@@ -90,31 +114,91 @@ class UserBuilder:
 
         if frame is None:
             print("[ERROR] Could not read from webcam.")
-            webcam.release()
+            if owns_webcam:
+                webcam.release()
             return {}
 
         height, width = frame.shape[:2]
 
-        config = {
+        # Keep tuning keys (e.g. detection_scale, gaze_filter) from earlier calibrations
+        config = self.load_config()
+        config.setdefault("gaze_filter", dict(DEFAULT_FILTER))
+        config.update({
             "center_left": gaze.pupil_left_coords(),
             "center_right": gaze.pupil_right_coords(),
             "webcam_resolution": {"width": width, "height": height}
-        }
+        })
+
+        if multi_point and config.get("gaze_mapping") and not recalibrate:
+            print("[INFO] Reusing the saved gaze mapping (run with --calibrate to redo it).")
+        elif multi_point:
+            points = self._collect_calibration_points(gaze, webcam, targets, settle, collect)
+            if points and len(points[0]) >= 3:
+                mapping = GazeMapping.fit(*points)
+                config["gaze_mapping"] = mapping.to_config()
+                print(f"[INFO] Gaze mapping fitted on {len(points[0])} points "
+                      f"(degree {mapping.degree}, residual {mapping.residual:.3f})")
+            else:
+                print("[WARN] Too few calibration points; keeping the previous gaze mapping.")
 
         self.save_config(config)
-        webcam.release()
+        if owns_webcam:
+            webcam.release()
         print(f"[INFO] Calibration saved with resolution {width}x{height}")
         return config
 
+    def _collect_calibration_points(self, gaze, webcam, targets, settle, collect, min_samples=5):
+        """Returns (raw ratio medians, screen targets), or None if ESC cancelled."""
+        window = "Calibration"
+        raw_points, screen_points = [], []
+        for point in targets:
+            started = time.time()
+            samples = []
+            while time.time() - started < settle + collect:
+                ret, frame = webcam.read()
+                if not ret:
+                    continue
+                # Mirror like the live pipeline so ratios match what the selector sees
+                frame = cv2.flip(frame, 1)
+                sample = gaze.refresh(frame)
+                elapsed = time.time() - started
+                if elapsed >= settle and sample.located and not sample.blinking:
+                    samples.append((sample.x, sample.y))
+
+                draw_calibration_target(frame, point, max(0.0, (elapsed - settle) / collect))
+                cv2.imshow(window, frame)
+                if cv2.waitKey(1) & 0xFF == 27:
+                    cv2.destroyWindow(window)
+                    return None
+
+            if len(samples) >= min_samples:
+                raw_points.append(np.median(samples, axis=0))
+                screen_points.append(point)
+            else:
+                print(f"[WARN] No stable gaze at calibration target {point}; skipping it.")
+
+        cv2.destroyWindow(window)
+        return raw_points, screen_points
+
     # --- Session-based logging ---
-    def init_session_stats(self, session_id):
+    def _journal_dir(self):
+        return f"{self.root}/journals/{self.user_id}"
+
+    def _journal_path(self, session_id):
+        return f"{self._journal_dir()}/{session_id}.jsonl"
+
+    def init_session_stats(self, session_id, fresh=False):
+        """Start a session. fresh discards any journal an earlier run left under the same session id."""
         self.session_id = session_id
         self.session_summary = {
             "user_id": self.user_id,
-            "start_time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "start_time": self._timestamp(),
             "total_frames": 0,
             "total_blinks": 0,
+            "single_blinks": 0,
+            "double_blinks": 0,
             "triple_blinks": 0,
+            "long_blinks": 0,
             "card_flips": 0,
             "cards_selected": [],
             "deck_activations": 0,
@@ -130,21 +214,20 @@ class UserBuilder:
             "total_dwell_events": 0,
             "total_dwell_time": 0.0
         }
-        self.session_events = []
-        self.r = []
-        self.theta = []
+        # Events go straight to an append-only journal instead of memory
+        self.journal = SessionJournal(self._journal_path(session_id), default=self._convert, truncate=fresh)
+        self.journal.append({"type": "session_start", "session_id": session_id, "summary": self._summary_snapshot()})
+        self._last_checkpoint = self.clock()
+
+    def _summary_snapshot(self):
+        return dict(self.session_summary, cards_selected=list(self.session_summary["cards_selected"]))
 
     def log_event_detail(self, event):
         if not self.session_id:
             print("[WARN] Session ID not initialized — call init_session_stats() first.")
             return
 
-        self.session_events.append(event)
-
-        if "avg_radius" in event:
-            self.r.append(event["avg_radius"])
-        if "avg_theta" in event:
-            self.theta.append(event["avg_theta"])
+        self.journal.append({"type": "event", "event": event})
 
         if "dwell_time" in event:
             self.session_summary["total_dwell_time"] += event["dwell_time"]
@@ -152,26 +235,115 @@ class UserBuilder:
         if event.get("type") == "card_selected":
             self.session_summary["cards_selected"].append(event["label"])
 
-    def save_session_data(self, config=None):
-        self.session_summary["end_time"] = time.strftime("%Y-%m-%d %H:%M:%S")
-
-        if self.r:
-            radius_arr = np.array(self.r)
-            self.session_summary["avg_gaze_radius"] = float(np.mean(radius_arr))
-            self.session_summary["std_gaze_radius"] = float(np.std(radius_arr))
-            self.session_summary["range_gaze_radius"] = float(np.max(radius_arr) - np.min(radius_arr))
-
-        if self.theta:
-            theta_arr = np.array(self.theta)
-            self.session_summary["avg_gaze_theta"] = float(np.mean(theta_arr))
-            self.session_summary["std_gaze_theta"] = float(np.std(theta_arr))
-            angular_range = float(np.max(theta_arr) - np.min(theta_arr)) if len(theta_arr) > 1 else 0.0
-            self.session_summary["angular_range_theta"] = angular_range
-
-        data = self._load_user_data()
-        data[self.session_id] = {
+    def checkpoint_if_due(self, interval=5.0):
+        """Journal the running summary counters so a crash loses at most `interval` seconds of them."""
+        if not self.session_id:
+            return
+        now = self.clock()
+        if now - self._last_checkpoint >= interval:
+            self._last_checkpoint = now
+            self.journal.append({"type": "checkpoint", "summary": self._summary_snapshot()})
+
+    def finalize_session(self, config=None):
+        """Write the closing summary to the journal and close it. Returns the journal path."""
+        self.session_summary["end_time"] = self._timestamp()
+        self.journal.append({
+            "type": "session_end",
             "config": config or self.load_config(),
-            "summary": self.session_summary,
-            "events": self.session_events
-        }
-        self._save_user_data(data)
+            "summary": self._summary_snapshot()
+        })
+        self.journal.close()
+        return self.journal.path
+
+    def build_session_payload(self, config=None):
+        """Finalize the session and return its {config, summary, events} entry built from the journal."""
+        path = self.finalize_session(config)
+        payload, _ = self._payload_from_journal(path)
+        self.session_summary = payload["summary"]
+        return payload
+
+    def save_session_data(self, config=None):
+        payload = self.build_session_payload(config)
+        self.store.put_session(self.user_id, self.session_id, payload)
+        os.remove(self.journal.path)
+        if self.usage is not None:
+            self.store.save_usage(self.user_id, self.usage.to_dict())
+
+    def load_usage_model(self):
+        """The user's card usage model, built from saved sessions the first time."""
+        if self.usage is None:
+            data = self.store.load_usage(self.user_id)
+            if data is not None:
+                self.usage = UsageModel.from_dict(data)
+            else:
+                self.usage = UsageModel.from_history(self.store, self.user_id)
+                print(f"[INFO] Built usage model from {self.usage.observations} past selection(s).")
+        return self.usage
+
+    def _payload_from_journal(self, path):
+        """Compact one journal into the nested {config, summary, events} entry. Returns (payload, complete)."""
+        config = {}
+        summary = None
+        complete = False
+        events = []
+        radius = RunningStats()
+        angle = CircularStats()
+
+        for record in read_journal(path):
+            kind = record.get("type")
+            if kind == "event":
+                event = record["event"]
+                events.append(event)
+                if event.get("avg_radius") is not None:
+                    radius.push(event["avg_radius"])
+                if event.get("avg_theta") is not None:
+                    angle.push(event["avg_theta"])
+            elif kind in ("session_start", "checkpoint", "session_end"):
+                summary = record["summary"]
+                if kind == "session_end":
+                    config = record.get("config", {})
+                    complete = True
+
+        summary = summary or {"user_id": self.user_id}
+        if not complete:
+            summary.setdefault("end_time", None)
+            summary["recovered"] = True
+
+        if radius.count:
+            summary["avg_gaze_radius"] = radius.mean
+            summary["std_gaze_radius"] = radius.std
+            summary["range_gaze_radius"] = radius.range
+
+        if angle.count:
+            summary["avg_gaze_theta"] = angle.mean
+            summary["std_gaze_theta"] = angle.std
+            summary["angular_range_theta"] = angle.range
+
+        return {"config": config, "summary": summary, "events": events}, complete
+
+    def compact(self, include_incomplete=False):
+        """Move journals left behind (e.g. by a crash) into the session store and remove them.
+
+        Journals without a session_end record are skipped unless include_incomplete
+        is set, since they may belong to a session that is still running.
+        Returns the compacted session ids.
+        """
+        journal_dir = self._journal_dir()
+        if not os.path.isdir(journal_dir):
+            return []
+
+        compacted = []
+        for name in sorted(os.listdir(journal_dir)):
+            if not name.endswith(".jsonl"):
+                continue
+            session_id = name[:-len(".jsonl")]
+            if self.journal and not self.journal.closed and session_id == self.session_id:
+                continue
+            path = os.path.join(journal_dir, name)
+            payload, complete = self._payload_from_journal(path)
+            if not complete and not include_incomplete:
+                continue
+            self.store.put_session(self.user_id, session_id, payload)
+            os.remove(path)
+            compacted.append(session_id)
+        return compacted
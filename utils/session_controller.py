@@ -0,0 +1,275 @@
+import time
+from utils.gaze_base_extended.gaze_selector import GazeSelector
+from utils.gaze_base_extended.blink_manager import BlinkManager, SINGLE, DOUBLE, TRIPLE
+from utils.gaze_base_extended.gaze_filter import build_filter
+from utils.gaze_base_extended.gaze_mapping import GazeMapping
+from utils.gaze_base_extended.radial_layout import screen_layout
+from utils.deck_manager import DeckManager, deck, ACTIONS
+from utils.action_dispatcher import ActionDispatcher
+from utils.trace_recorder import TraceRecorder
+from utils.instrumentation import NullProfiler
+
+# Radial layout "func" names the controller handles itself; any other func
+# must name a deck action (utils.deck_manager.ACTIONS), run like a card
+LAYOUT_COMMANDS = ("toggle", "select_card", "next_card", "back")
+
+
+class SessionController:
+    """Selection, blink and deck logic for one user session, without any drawing.
+
+    main.py renders on top of this; the offline replay drives it directly
+    from recorded frames with an injected clock.
+    """
+
+    def __init__(self, user, selector, blink_manager, deck_manager, clock=time.time, profiler=None,
+                 gaze_filter=None, gaze_mapping=None, events=None, trace=None, double_back=False):
+        self.user = user
+        self.selector = selector
+        self.blink_manager = blink_manager
+        self.deck_manager = deck_manager
+        self.clock = clock
+        self.profiler = profiler or NullProfiler()
+        self.gaze_filter = gaze_filter
+        self.gaze_mapping = gaze_mapping
+        self.events = events
+        self.trace = trace
+        self.double_back = double_back
+        self.emergency_mode = False
+        self.last_gesture = None
+        self.target_funcs = self._resolve_targets()
+        if self.dispatcher is not None:
+            self.dispatcher.on_complete = self.record_action
+
+    def _resolve_targets(self):
+        """Layout key -> func. Targets with an unknown func are reported and never dwell."""
+        funcs = {}
+        for key, data in self.selector.button_actions.items():
+            func = data.get("func")
+            if func in LAYOUT_COMMANDS or func in ACTIONS:
+                funcs[key] = func
+            else:
+                print(f"[WARN] Layout target '{key}' uses unknown func '{func}'; it can't be selected.")
+                data["func"] = None
+        return funcs
+
+    def step(self, sample):
+        """Process one gaze sample. Returns the logged dwell event, if any."""
+        user = self.user
+        selector = self.selector
+        deck_manager = self.deck_manager
+
+        # Blink state first, so dwell pauses on the very frame the eyes close
+        with self.profiler.stage("blink"):
+            blink_type = self.blink_manager.update(sample.timestamp, sample.ear)
+        self.last_gesture = blink_type
+        selector.dwell_enabled = not self.blink_manager.closed
+        user.session_summary["total_frames"] += 1
+
+        # Map raw ratios to screen position, then smooth before selection so
+        # boundary jitter doesn't reset dwell progress
+        smoothed = sample
+        with self.profiler.stage("filter"):
+            if self.gaze_mapping is not None:
+                smoothed = self.gaze_mapping.apply_sample(smoothed)
+            if self.gaze_filter is not None:
+                smoothed = self.gaze_filter.apply(smoothed)
+
+        with self.profiler.stage("select"):
+            event = selector.update(
+                smoothed,
+                deck_manager=deck_manager if deck_manager.is_active() else None,
+                emergency_mode=self.emergency_mode
+            )
+
+            # Handle Dwell triggered events
+            if event:
+                # Augment base event with raw gaze metrics
+                event["horizontal_ratio"] = sample.horizontal_ratio()
+                event["vertical_ratio"] = sample.vertical_ratio()
+                self._handle_dwell(event)
+
+                # Log final composed event
+                user.log_event_detail(event)
+                self.publish(event.get("type", "dwell"), event=event)
+
+        # Blink Navigation
+        if blink_type:
+            self._handle_blink(blink_type, self.clock())
+
+        if self.trace is not None:
+            self._record_trace(sample, smoothed)
+
+        deck_manager.reload_if_changed(self.clock())
+        user.checkpoint_if_due()
+        return event
+
+    def _record_trace(self, sample, smoothed):
+        selector = self.selector
+        r = theta = None
+        if smoothed.x is not None and smoothed.y is not None:
+            r, theta = selector.layout.polar(smoothed.x, smoothed.y)
+        self.trace.record(sample.timestamp, sample.x, sample.y, smoothed.x, smoothed.y, r, theta, sample.ear,
+                          sample.located, sample.blinking, self.blink_manager.closed,
+                          selector.current_selection, selector.dwell_progress)
+
+    def _handle_dwell(self, event):
+        user = self.user
+        deck_manager = self.deck_manager
+        func = self.target_funcs.get(event["action"])
+
+        if self.emergency_mode:
+            if func == "toggle":
+                self.emergency_mode = False
+                user.session_summary["emergency_mode_exits"] += 1
+                deck_manager.deactivate()
+                self.publish("emergency_mode", active=False)
+        else:
+            if func == "toggle":
+                if deck_manager.is_active():
+                    deck_manager.deactivate()
+                    user.session_summary["deck_deactivations"] += 1
+                else:
+                    deck_manager.activate()
+                    user.session_summary["deck_activations"] += 1
+
+            elif not deck_manager.is_active():
+                return
+
+            elif func == "next_card":
+                deck_manager.on_blink(self.clock())
+                user.session_summary["card_flips"] += 1
+
+            elif func == "back":
+                deck_manager.back()
+
+            elif func in ACTIONS:
+                # A target bound straight to an action, e.g. a "Yes" sector
+                label = self.selector.button_actions[event["action"]]["label"]
+                card = {"label": label, "func": ACTIONS[func]}
+                if func == "emergency":
+                    card["priority"] = "emergency"
+                deck_manager.run_action(card)
+                event["label"] = label
+                if deck_manager.last_ticket is not None:
+                    event["action_id"] = deck_manager.last_ticket.id
+
+            elif func == "select_card":
+                selected_card = deck_manager.select(self.clock())
+                user.session_summary["card_flips"] += 1
+
+                # Add type and label for card-specific events
+                event["type"] = "card_selected"
+                event["label"] = selected_card["label"]
+                if deck_manager.last_ticket is not None:
+                    # Matches the action_complete record journaled when the action finishes
+                    event["action_id"] = deck_manager.last_ticket.id
+
+                if selected_card["label"].strip().lower() == "emergency":
+                    self.emergency_mode = True
+                    user.session_summary["emergency_mode_entries"] += 1
+                    self.publish("emergency_mode", active=True)
+
+    def _handle_blink(self, blink_type, now):
+        """One classified blink gesture: triple opens the deck, single flips a card, double (if double_back) goes up a level."""
+        user = self.user
+        deck_manager = self.deck_manager
+
+        user.session_summary["total_blinks"] += self.blink_manager.gesture_blinks
+        user.session_summary[f"{blink_type}_blinks"] += 1
+        self.publish("blink", gesture=blink_type)
+
+        if blink_type == TRIPLE:
+            deck_manager.activate()
+            user.session_summary["deck_activations"] += 1
+        elif deck_manager.is_active() and blink_type == SINGLE:
+            deck_manager.on_blink(now)
+            user.session_summary["card_flips"] += 1
+        elif deck_manager.is_active() and blink_type == DOUBLE and self.double_back:
+            deck_manager.back()
+
+    @property
+    def dispatcher(self):
+        return self.deck_manager.dispatcher
+
+    def publish(self, kind, **fields):
+        """Send a live event to dashboard subscribers, if an event stream is attached."""
+        if self.events is None:
+            return
+        self.events.publish(dict(fields, type=kind, user_id=self.user.user_id,
+                                 session_id=self.user.session_id, time=self.clock()))
+
+    def record_action(self, record):
+        """Dispatcher on_complete: journal the card action outcome and stream it."""
+        self.user.log_event_detail(record)
+        self.publish("action_complete", **{k: v for k, v in record.items() if k != "type"})
+
+    def close(self, timeout=2.0):
+        """Let queued card actions finish (up to `timeout` seconds) and flush the trace before the session is saved."""
+        if self.dispatcher is not None:
+            self.dispatcher.shutdown(timeout)
+        if self.trace is not None:
+            self.trace.close()
+
+
+# build_controller argument -> user config key
+CONFIG_KEYS = {
+    "layout": "radial_layout",
+    "gaze_filter": "gaze_filter",
+    "gaze_mapping": "gaze_mapping",
+    "deck_file": "deck_file",
+    "deck_order": "deck_order",
+    "blink": "blink",
+    "double_blink_back": "double_blink_back",
+}
+
+
+def controller_options(config):
+    """build_controller keyword arguments taken from a user config."""
+    return {arg: config.get(key) for arg, key in CONFIG_KEYS.items()}
+
+
+def build_controller(user, clock=time.time, trigger_time=1.25, profiler=None, layout=None, gaze_filter=None,
+                     gaze_mapping=None, deck_file=None, deck_order=None, blink=None, double_blink_back=False,
+                     events=None, trace_dir=None):
+    """Wire up the default selector, blink manager and deck used by main.py.
+
+    layout is an optional radial layout spec (see radial_layout.RadialLayout);
+    None keeps the two upper-corner targets, with sectors fitted to the drawn
+    buttons when a gaze mapping puts gaze in screen space. gaze_filter is the user's
+    "gaze_filter" config entry (see gaze_filter.build_filter) and
+    gaze_mapping the calibrated "gaze_mapping" entry; None skips either stage.
+    deck_file is a JSON/YAML deck (hot-reloaded); None uses the built-in deck.
+    deck_order ("reorder" or "predict") ranks each deck level by the user's
+    card usage; None keeps the authored order. blink holds BlinkManager
+    thresholds (e.g. {"long_blink": 1.0}) from the "blink" config entry.
+    double_blink_back makes a double blink go up one deck level; without it
+    blinks aren't grouped (group_gap 0 unless set), so a single flips at once.
+    events is an optional EventStream for live dashboards; trace_dir, if set,
+    records every frame there (see trace_recorder). Card actions run on an
+    ActionDispatcher whose outcomes are journaled; call controller.close()
+    before saving the session.
+    """
+    mapping = GazeMapping.from_config(gaze_mapping)
+    if layout is None and mapping is not None:
+        layout = screen_layout()
+    # Outer radius 0.75 covers the whole 0..1 ratio square, so sectors reach the frame edges as before
+    selector = GazeSelector(trigger_time=trigger_time, center=(0.5, 0.5), inner_radius=0.00,
+                            outer_radius=0.75, clock=clock, layout=layout)
+    blink = dict(blink or {})
+    if not double_blink_back:
+        # Doubles do nothing, so don't hold each single back waiting for a second blink
+        blink.setdefault("group_gap", 0.0)
+    blink_manager = BlinkManager(**blink)
+    usage = user.load_usage_model() if deck_order else None
+    if usage is not None:
+        usage.reset_context()
+    dispatcher = ActionDispatcher(clock=clock)
+    options = dict(selector=selector, usage=usage, order_mode=deck_order or "reorder", dispatcher=dispatcher)
+    if deck_file:
+        deck_manager = DeckManager.from_file(deck_file, **options)
+    else:
+        deck_manager = DeckManager(deck, **options)
+    return SessionController(user, selector, blink_manager, deck_manager, clock=clock, profiler=profiler,
+                             gaze_filter=build_filter(gaze_filter),
+                             gaze_mapping=mapping, events=events, double_back=bool(double_blink_back),
+                             trace=TraceRecorder(trace_dir, selections=selector.layout.keys) if trace_dir else None)
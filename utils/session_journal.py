@@ -0,0 +1,97 @@
+"""Append-only, line-delimited JSON journal for one session.
+
+Records are queued by the frame thread and written in batches by a
+background thread, so logging never waits on disk. Each line is one
+record with a "type" of session_start, event, checkpoint or session_end.
+A journal without a session_end record belongs to a session that is still
+running or crashed; its last checkpoint holds the latest summary counters.
+
+Usage (move journals left behind by crashed or interrupted runs into the session store):
+    python -m utils.session_journal --user 99 [--recover]
+"""
+import os
+import json
+import queue
+import argparse
+import threading
+
+_CLOSE = object()
+
+
+class SessionJournal:
+    def __init__(self, path, batch_size=64, flush_interval=0.5, default=None, truncate=False):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.default = default
+        self.records_written = 0
+        self._queue = queue.Queue()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # truncate starts over a journal left behind by an earlier run of the same session
+        self._file = open(path, "w" if truncate else "a")
+        self._writer = threading.Thread(target=self._write_loop, name="session-journal", daemon=True)
+        self._writer.start()
+
+    @property
+    def closed(self):
+        return self._file is None
+
+    def append(self, record):
+        """Queue a record for writing. Never blocks on disk."""
+        self._queue.put(record)
+
+    def close(self):
+        """Flush everything queued so far and close the file."""
+        if self._file is None:
+            return
+        self._queue.put(_CLOSE)
+        self._writer.join()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
+
+    def _write_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size and batch[-1] is not _CLOSE:
+                try:
+                    batch.append(self._queue.get(timeout=self.flush_interval))
+                except queue.Empty:
+                    break
+
+            closing = batch[-1] is _CLOSE
+            records = batch[:-1] if closing else batch
+            if records:
+                self._file.write("".join(json.dumps(r, default=self.default) + "\n" for r in records))
+                self._file.flush()
+                self.records_written += len(records)
+            if closing:
+                return
+
+
+def read_journal(path):
+    """Yield the records of a journal, skipping a torn final line left by a crash."""
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def main():
+    from utils.session_builder import UserBuilder
+
+    parser = argparse.ArgumentParser(description="Compact leftover session journals into the session store.")
+    parser.add_argument("--user", required=True)
+    parser.add_argument("--root", default="data")
+    parser.add_argument("--recover", action="store_true", help="Also fold in journals of crashed sessions")
+    args = parser.parse_args()
+
+    sessions = UserBuilder(args.user, root=args.root).compact(include_incomplete=args.recover)
+    print(f"[INFO] Compacted {len(sessions)} session(s) for user '{args.user}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Per-session storage for user_data.
+
+Layout:
+    data/user_data/<id>/index.json                 session id -> start/end time, frame and event counts
+    data/user_data/<id>/sessions/<session_id>.json {config, summary, events} for one session
+    data/user_data/<id>/usage.json                 card usage model for adaptive deck ordering
+
+Reading, listing or deleting one session only touches that session's file
+and the small index, instead of the user's whole history.
+
+Usage:
+    python -m utils.session_store migrate [--root data/user_data]
+    python -m utils.session_store list --user 99 [--root data/user_data]
+"""
+import os
+import json
+import argparse
+
+LEGACY_SUFFIX = ".migrated"
+
+
+class SessionStore:
+    def __init__(self, root="data/user_data", default=None):
+        self.root = root
+        self.default = default
+
+    def _user_dir(self, user_id):
+        return os.path.join(self.root, str(user_id))
+
+    def _index_path(self, user_id):
+        return os.path.join(self._user_dir(user_id), "index.json")
+
+    def session_path(self, user_id, session_id):
+        return os.path.join(self._user_dir(user_id), "sessions", f"{session_id}.json")
+
+    def _write_json(self, path, data, indent=None):
+        # Write-then-rename so a crash never leaves a half-written file
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=indent, default=self.default)
+        os.replace(tmp_path, path)
+
+    def load_index(self, user_id):
+        path = self._index_path(user_id)
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                return json.load(f)
+        return {}
+
+    def _save_index(self, user_id, index):
+        self._write_json(self._index_path(user_id), index, indent=2)
+
+    def put_session(self, user_id, session_id, payload):
+        self._write_json(self.session_path(user_id, session_id), payload)
+        summary = payload.get("summary", {})
+        index = self.load_index(user_id)
+        index[session_id] = {
+            "start_time": summary.get("start_time"),
+            "end_time": summary.get("end_time"),
+            "frame_count": summary.get("total_frames", 0),
+            "event_count": len(payload.get("events", []))
+        }
+        self._save_index(user_id, index)
+
+    def get_session(self, user_id, session_id):
+        path = self.session_path(user_id, session_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def has_session(self, user_id, session_id):
+        return session_id in self.load_index(user_id)
+
+    def list_sessions(self, user_id):
+        """Return [(session_id, index entry)] sorted by session id."""
+        return sorted(self.load_index(user_id).items())
+
+    def delete_session(self, user_id, session_id):
+        index = self.load_index(user_id)
+        if index.pop(session_id, None) is None:
+            return False
+        path = self.session_path(user_id, session_id)
+        if os.path.exists(path):
+            os.remove(path)
+        self._save_index(user_id, index)
+        return True
+
+    def _usage_path(self, user_id):
+        return os.path.join(self._user_dir(user_id), "usage.json")
+
+    def load_usage(self, user_id):
+        """The user's saved card usage model (see utils.usage_model), or None."""
+        path = self._usage_path(user_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def save_usage(self, user_id, data):
+        self._write_json(self._usage_path(user_id), data)
+
+    def list_users(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root) if os.path.exists(self._index_path(name)))
+
+    def export_user(self, user_id):
+        """Build the legacy nested payload {user_id, <session_id>: {config, summary, events}}."""
+        data = {"user_id": str(user_id)}
+        for session_id, _ in self.list_sessions(user_id):
+            data[session_id] = self.get_session(user_id, session_id)
+        return data
+
+    def legacy_path(self, user_id):
+        return os.path.join(self.root, f"{user_id}.json")
+
+    def legacy_users(self):
+        """Users whose history is still an unmigrated data/user_data/<id>.json file."""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name[:-len(".json")] for name in os.listdir(self.root)
+                      if name.endswith(".json") and os.path.isfile(os.path.join(self.root, name)))
+
+    def read_legacy(self, path):
+        """(user_id, {session_id: payload}) from one legacy file, which is left untouched."""
+        with open(path, "r") as f:
+            data = json.load(f)
+        user_id = str(data.get("user_id") or os.path.splitext(os.path.basename(path))[0])
+        sessions = {session_id: payload for session_id, payload in data.items()
+                    if session_id != "user_id" and isinstance(payload, dict)}
+        return user_id, sessions
+
+    def migrate_legacy(self, path):
+        """Split one legacy data/user_data/<id>.json file into session files. Returns the session count."""
+        user_id, sessions = self.read_legacy(path)
+        for session_id, payload in sessions.items():
+            self.put_session(user_id, session_id, payload)
+
+        os.replace(path, path + LEGACY_SUFFIX)
+        return len(sessions)
+
+    def migrate_all(self):
+        migrated = {}
+        if not os.path.isdir(self.root):
+            return migrated
+        for name in sorted(os.listdir(self.root)):
+            path = os.path.join(self.root, name)
+            if name.endswith(".json") and os.path.isfile(path):
+                migrated[name[:-len(".json")]] = self.migrate_legacy(path)
+        return migrated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage per-session user_data storage.")
+    parser.add_argument("command", choices=["migrate", "list"])
+    parser.add_argument("--root", default="data/user_data")
+    parser.add_argument("--user", default=None)
+    args = parser.parse_args()
+
+    store = SessionStore(args.root)
+    if args.command == "migrate":
+        migrated = store.migrate_all()
+        for user_id, count in migrated.items():
+            print(f"[INFO] Migrated {count} session(s) for user '{user_id}'")
+        print(f"[INFO] {len(migrated)} legacy file(s) migrated; originals kept as *.json{LEGACY_SUFFIX}")
+    elif args.command == "list":
+        users = [args.user] if args.user else store.list_users()
+        for user_id in users:
+            for session_id, entry in store.list_sessions(user_id):
+                print(f"{user_id}\t{session_id}\t{entry['start_time']}\t{entry['end_time']}\t"
+                      f"frames={entry['frame_count']}\tevents={entry['event_count']}")
+
+
+if __name__ == "__main__":
+    main()
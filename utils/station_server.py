@@ -0,0 +1,282 @@
+"""Serve several bedside stations from one process.
+
+Usage:
+    python -m utils.station_server stations.json [--workers 2] [--root data]
+
+stations.json lists one entry per bed. source is a camera index, or a video
+file / frame directory played back in real time in place of a camera:
+
+    {"stations": [
+        {"name": "bed1", "user": "99", "source": 0, "fps": 15},
+        {"name": "bed2", "user": "42", "source": "recordings/bed2.mp4", "fps": 10, "loop": true}
+    ]}
+
+Each station keeps its own capture thread, gaze tracker, selector, blink and
+deck state and session journal, and is driven by its user's saved config
+(run main.py once per user to calibrate). The dlib landmark model is
+loaded once and shared read-only by every tracker; each tracker has its own
+face detector, which keeps per-image state and can't be shared between
+workers.
+
+Inference and the session step run on a small worker pool scheduled
+earliest-deadline-first. A station is due 1/fps after its previous frame
+was due, and only its newest frame is processed, so a fast camera can't
+crowd out the others and a slow one never builds a backlog. A station is
+never processed by two workers at once. Every station gets its requested
+rate while the pool has capacity; stations that fall short are reported
+with [WARN]. A station's session is saved when its source ends or the
+server stops. With --events-port every station's live events share one
+event stream; each record carries its user_id and session_id (which ends
+in the station name).
+"""
+import json
+import time
+import argparse
+import threading
+import cv2
+from utils.gaze_base_extended.pupil_tracker import ExtendedGazeTracker, preload_models
+from utils.pipeline import StageStats
+from utils.replay import recording_frames
+from utils.session_builder import UserBuilder
+from utils.session_controller import build_controller, controller_options
+from utils.event_stream import EventStream
+
+
+class Station:
+    def __init__(self, name, user_id, source, fps=15.0, loop=False, flip=True, root="data", events=None):
+        self.name = name
+        self.source = int(source) if str(source).isdigit() else source
+        self.fps = float(fps)
+        self.period = 1.0 / self.fps
+        self.loop = loop
+        self.flip = flip
+
+        self.user = UserBuilder(user_id, root=root)
+        self.config = self.user.load_config()
+        self.gaze = ExtendedGazeTracker(detection_scale=self.config.get("detection_scale", 1.0))
+        self.user.init_session_stats(f"{time.strftime('%Y%m%d_%H%M%S')}_{name}")
+        self.controller = build_controller(self.user, events=events, **controller_options(self.config))
+
+        # Scheduler state, guarded by the server's condition
+        self.pending = None
+        self.busy = False
+        self.ended = False
+        self.finished = False
+        self.next_due = time.monotonic()
+        self.dropped = 0
+        self.late = 0
+        self.stats = {"capture": StageStats("capture"), "inference": StageStats("inference")}
+
+    def frames(self):
+        """Yield frames from the camera, or from a recording paced at its own timestamps."""
+        if isinstance(self.source, int):
+            webcam = cv2.VideoCapture(self.source)
+            try:
+                while True:
+                    ret, frame = webcam.read()
+                    if not ret:
+                        print(f"[ERROR] Station {self.name}: could not read camera {self.source}.")
+                        return
+                    yield frame
+            finally:
+                webcam.release()
+
+        while True:
+            started = time.time()
+            for offset, frame in recording_frames(self.source):
+                delay = started + offset - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                yield frame
+            if not self.loop:
+                return
+
+    def process(self, captured_at, frame):
+        sample = self.gaze.refresh(frame, captured_at)
+        self.controller.step(sample)
+        self.stats["inference"].tick()
+
+    def close(self):
+        self.controller.close()
+        self.user.save_session_data(config=self.config)
+        self.finished = True
+        print(f"[INFO] Station {self.name}: saved session {self.user.session_id} for user '{self.user.user_id}'.")
+
+    def summary(self):
+        return (f"{self.name} (user {self.user.user_id}): inference {self.stats['inference'].fps():.1f}"
+                f"/{self.fps:g} fps, capture {self.stats['capture'].fps():.1f} fps, "
+                f"dropped {self.dropped}, late {self.late}")
+
+
+class StationServer:
+    def __init__(self, stations, workers=2, report_interval=5.0):
+        self.stations = stations
+        self.workers = workers
+        self.report_interval = report_interval
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._threads = []
+
+    # --- Capture side ---
+    def _capture_loop(self, station):
+        try:
+            for frame in station.frames():
+                if self._stopped:
+                    break
+                if station.flip:
+                    frame = cv2.flip(frame, 1)
+                station.stats["capture"].tick()
+                self.offer(station, time.time(), frame)
+        except Exception as e:
+            print(f"[ERROR] Station {station.name}: capture failed: {e}")
+        with self._cond:
+            station.ended = True
+            self._cond.notify_all()
+
+    def offer(self, station, captured_at, frame):
+        """Hand over a station's newest frame; an unprocessed older one is dropped."""
+        with self._cond:
+            if station.pending is not None:
+                station.dropped += 1
+            station.pending = (captured_at, frame)
+            self._cond.notify_all()
+
+    # --- Scheduling ---
+    def _next_job(self):
+        """Earliest-deadline-first among stations that are due, idle and have a frame."""
+        with self._cond:
+            while not self._stopped:
+                now = time.monotonic()
+                best = None
+                wake = None
+                for station in self.stations:
+                    if station.busy or station.pending is None:
+                        continue
+                    if station.next_due > now:
+                        wake = station.next_due if wake is None else min(wake, station.next_due)
+                    elif best is None or station.next_due < best.next_due:
+                        best = station
+
+                if best is not None:
+                    if now - best.next_due > best.period:
+                        best.late += 1
+                    # Late stations catch up by one frame at most instead of bursting
+                    best.next_due = max(best.next_due + best.period, now)
+                    best.busy = True
+                    item, best.pending = best.pending, None
+                    return best, item
+                self._cond.wait(None if wake is None else wake - now)
+            return None
+
+    def _work(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            station, (captured_at, frame) = job
+            try:
+                station.process(captured_at, frame)
+            except Exception as e:
+                print(f"[WARN] Station {station.name}: frame failed: {e}")
+            finally:
+                with self._cond:
+                    station.busy = False
+                    self._cond.notify_all()
+
+    # --- Lifecycle ---
+    def run(self):
+        for station in self.stations:
+            thread = threading.Thread(target=self._capture_loop, args=(station,),
+                                      name=f"capture-{station.name}", daemon=True)
+            thread.start()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"station-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+        print(f"[INFO] Serving {len(self.stations)} station(s) on {self.workers} worker(s) "
+              f"(requested {sum(s.fps for s in self.stations):g} fps in total)")
+        last_report = time.time()
+        try:
+            while not all(station.finished for station in self.stations):
+                time.sleep(0.2)
+                self._close_ended()
+                if time.time() - last_report >= self.report_interval:
+                    last_report = time.time()
+                    self.report()
+        except KeyboardInterrupt:
+            print("[INFO] Stopping station server...")
+        finally:
+            self.stop()
+
+    def _close_ended(self):
+        with self._cond:
+            done = [s for s in self.stations
+                    if s.ended and not s.finished and not s.busy and s.pending is None]
+        for station in done:
+            station.close()
+
+    def report(self):
+        for station in self.stations:
+            if station.finished:
+                continue
+            fps = station.stats["inference"].fps()
+            level = "WARN" if station.stats["inference"].count > station.fps and fps < 0.9 * station.fps else "PERF"
+            print(f"[{level}] {station.summary()}")
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(2.0)
+        for station in self.stations:
+            if not station.finished:
+                station.close()
+
+
+def load_stations(path, root="data", events=None):
+    """Stations from a stations.json file; entries for unknown users are skipped."""
+    with open(path, "r") as f:
+        entries = json.load(f).get("stations", [])
+
+    stations = []
+    for i, entry in enumerate(entries):
+        name = entry.get("name", f"station{i + 1}")
+        user_id = str(entry["user"])
+        if not UserBuilder(user_id, root=root).validate_user():
+            print(f"[ERROR] Station {name}: user '{user_id}' is not registered; skipping it.")
+            continue
+        stations.append(Station(name, user_id, entry.get("source", 0), fps=entry.get("fps", 15.0),
+                                loop=entry.get("loop", False), flip=entry.get("flip", True), root=root,
+                                events=events))
+    return stations
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several bedside stations in one process.")
+    parser.add_argument("stations", help="stations.json describing each station's user, source and fps")
+    parser.add_argument("--workers", type=int, default=2, help="Inference worker threads shared by all stations")
+    parser.add_argument("--root", default="data", help="Data root for user configs and session logs")
+    parser.add_argument("--report-interval", type=float, default=5.0, help="Seconds between per-station reports")
+    parser.add_argument("--events-port", type=int, default=None, help="Stream every station's live events on this localhost port")
+    parser.add_argument("--events-socket", default=None, help="Stream live events on this Unix socket instead")
+    args = parser.parse_args()
+
+    # Load the shared landmark model while the station entries are read
+    preload_models()
+    events = None
+    if args.events_port or args.events_socket:
+        events = EventStream(port=args.events_port or 0, unix_path=args.events_socket).start()
+    stations = load_stations(args.stations, root=args.root, events=events)
+    if not stations:
+        parser.error("no usable stations")
+    try:
+        StationServer(stations, workers=args.workers, report_interval=args.report_interval).run()
+    finally:
+        if events:
+            events.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""Per-frame gaze traces in chunked, typed columns for research analysis.
+
+Usage (summarise a recorded trace):
+    python -m utils.trace_recorder data/traces/99/20250623_175007
+
+Dwell events only keep aggregates; a trace keeps every frame. Values go
+into preallocated NumPy column buffers (one array per column, chunk_frames
+rows). A full chunk is handed to a writer thread and recording continues
+in a spare buffer, so record() never touches the disk. Each chunk is a
+directory of .npy files, one per column:
+
+    <trace dir>/meta.json              column names, dtypes and selection labels
+    <trace dir>/chunk_00000/x.npy ...
+
+open_trace() memory-maps the chunks, so hours of frames load without
+copying or parsing; only the pages a computation touches are read.
+Iterate Trace.column_chunks() to stay zero-copy; Trace.column() joins the
+chunks into one array, which copies when there is more than one.
+Recording into a directory that already holds a trace replaces it.
+"""
+import os
+import json
+import queue
+import shutil
+import argparse
+import threading
+import numpy as np
+
+# (column, dtype). Missing values are NaN; selection is an index into the
+# trace's selection labels, -1 for none.
+COLUMNS = (
+    ("timestamp", "f8"),
+    ("x", "f4"),                # raw horizontal pupil ratio
+    ("y", "f4"),                # raw vertical pupil ratio
+    ("screen_x", "f4"),         # after the calibrated mapping and smoothing filter
+    ("screen_y", "f4"),
+    ("r", "f4"),                # polar position of screen_x/y around the selector center
+    ("theta", "f4"),
+    ("ear", "f4"),              # eye aspect ratio
+    ("located", "u1"),
+    ("blinking", "u1"),         # tracker's per-frame blink flag
+    ("eye_closed", "u1"),       # blink detector state
+    ("selection", "i1"),
+    ("dwell_progress", "f4"),
+)
+NAN = float("nan")
+
+
+class TraceRecorder:
+    def __init__(self, directory, selections=(), chunk_frames=9000, spare_buffers=2):
+        self.directory = directory
+        self.chunk_frames = chunk_frames
+        self.selections = list(selections)
+        self.selection_index = {key: i for i, key in enumerate(self.selections)}
+        self.frames = 0
+        self.chunks = 0
+        self.extra_buffers = 0
+
+        os.makedirs(directory, exist_ok=True)
+        stale = [entry for entry in os.listdir(directory) if entry.startswith("chunk_")]
+        if stale:
+            # e.g. a replay rerun under the same recording name; never mix in the old run's chunks
+            print(f"[WARN] Replacing the existing trace in {directory}")
+            for entry in stale:
+                shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+        with open(os.path.join(directory, "meta.json"), "w") as f:
+            json.dump({"columns": [list(c) for c in COLUMNS], "selections": self.selections,
+                       "chunk_frames": chunk_frames}, f, indent=2)
+
+        self._free = queue.Queue()
+        for _ in range(spare_buffers):
+            self._free.put(self._allocate())
+        self._buffers = self._allocate()
+        self._columns = [self._buffers[name] for name, _ in COLUMNS]
+        self._row = 0
+        self._pending = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="trace-writer", daemon=True)
+        self._writer.start()
+
+    def _allocate(self):
+        return {name: np.empty(self.chunk_frames, dtype=dtype) for name, dtype in COLUMNS}
+
+    def record(self, timestamp, x, y, screen_x, screen_y, r, theta, ear, located, blinking, eye_closed,
+               selection, dwell_progress):
+        """Store one frame. None becomes NaN (or -1 for selection). Never blocks on disk."""
+        row = self._row
+        values = (timestamp, NAN if x is None else x, NAN if y is None else y,
+                  NAN if screen_x is None else screen_x, NAN if screen_y is None else screen_y,
+                  NAN if r is None else r, NAN if theta is None else theta, NAN if ear is None else ear,
+                  located, blinking, eye_closed, self.selection_index.get(selection, -1), dwell_progress)
+        for column, value in zip(self._columns, values):
+            column[row] = value
+        self.frames += 1
+        self._row = row + 1
+        if self._row == self.chunk_frames:
+            self._rotate()
+
+    def _rotate(self):
+        self._pending.put((self.chunks, self._buffers, self._row))
+        self.chunks += 1
+        try:
+            self._buffers = self._free.get_nowait()
+        except queue.Empty:
+            # Writer has fallen behind; grow rather than stall the frame loop
+            self._buffers = self._allocate()
+            self.extra_buffers += 1
+        self._columns = [self._buffers[name] for name, _ in COLUMNS]
+        self._row = 0
+
+    def _write_loop(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            index, buffers, rows = item
+            chunk_dir = os.path.join(self.directory, f"chunk_{index:05d}")
+            tmp_dir = chunk_dir + ".tmp"
+            try:
+                os.makedirs(tmp_dir, exist_ok=True)
+                for name, _ in COLUMNS:
+                    np.save(os.path.join(tmp_dir, f"{name}.npy"), buffers[name][:rows])
+                # Readers only ever see complete chunks
+                os.replace(tmp_dir, chunk_dir)
+            except OSError as e:
+                print(f"[ERROR] Could not write trace chunk {index}: {e}")
+            self._free.put(buffers)
+
+    def close(self):
+        """Write the partial last chunk and wait for the writer. Returns the trace directory."""
+        if self._writer is None:
+            return self.directory
+        if self._row:
+            self._rotate()
+        self._pending.put(None)
+        self._writer.join()
+        self._writer = None
+        if self.extra_buffers:
+            print(f"[WARN] Trace writer fell behind {self.extra_buffers} time(s); consider larger chunks.")
+        return self.directory
+
+
+class Trace:
+    """A recorded trace: chunks of memory-mapped columns plus its meta data."""
+
+    def __init__(self, directory, columns=None):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json"), "r") as f:
+            self.meta = json.load(f)
+        self.selections = self.meta.get("selections", [])
+        names = columns or [name for name, _ in self.meta["columns"]]
+        self.chunks = []
+        for entry in sorted(os.listdir(directory)):
+            chunk_dir = os.path.join(directory, entry)
+            if entry.startswith("chunk_") and not entry.endswith(".tmp") and os.path.isdir(chunk_dir):
+                self.chunks.append({name: np.load(os.path.join(chunk_dir, f"{name}.npy"), mmap_mode="r")
+                                    for name in names})
+
+    def __len__(self):
+        return sum(len(next(iter(chunk.values()))) for chunk in self.chunks if chunk)
+
+    def column_chunks(self, name):
+        """Yield one column chunk by chunk as memory-mapped arrays, without copying."""
+        for chunk in self.chunks:
+            yield chunk[name]
+
+    def column(self, name):
+        """One column over the whole trace as a single array. Copies when there is more than one chunk."""
+        parts = list(self.column_chunks(name))
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts) if parts else np.empty(0, dtype=dict(self.meta["columns"])[name])
+
+
+def open_trace(directory, columns=None):
+    return Trace(directory, columns)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarise a per-frame gaze trace.")
+    parser.add_argument("directory", help="Trace directory (data/traces/<user>/<session_id>)")
+    args = parser.parse_args()
+
+    trace = open_trace(args.directory)
+    frames = len(trace)
+    print(f"[INFO] {frames} frames in {len(trace.chunks)} chunk(s)")
+    if not frames:
+        return
+    # Reduce chunk by chunk so a multi-hour trace is never copied into one array
+    timestamps = [chunk for chunk in trace.column_chunks("timestamp") if len(chunk)]
+    seconds = float(timestamps[-1][-1] - timestamps[0][0])
+    located = sum(int(np.count_nonzero(chunk)) for chunk in trace.column_chunks("located"))
+    closed = sum(int(np.count_nonzero(chunk)) for chunk in trace.column_chunks("eye_closed"))
+    print(f"[INFO] {seconds:.1f}s at {frames / seconds if seconds > 0 else 0:.1f} fps, "
+          f"located {located / frames:.1%}, eyes closed {closed / frames:.1%}")
+    counts = np.zeros(len(trace.selections) + 1, dtype=np.int64)
+    for chunk in trace.column_chunks("selection"):
+        # -1 (no selection) lands in the last bin
+        counts += np.bincount(chunk.astype(np.int64) % len(counts), minlength=len(counts))
+    for i, key in enumerate(trace.selections):
+        print(f"[INFO] {key}: {int(counts[i])} frames")
+
+
+if __name__ == "__main__":
+    main()
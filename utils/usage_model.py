@@ -0,0 +1,152 @@
+"""Per-user card usage model for adaptive deck ordering.
+
+Two bounded, incrementally updated statistics over card selections:
+
+- frequency/recency: one exponentially decayed count per label, so a card
+  picked often last week outranks one picked often last year;
+- a bigram model: how often each label followed the previous selection
+  (e.g. "Basic Needs Menu" -> "Hungry"), used to predict the next card.
+
+observe() is O(1) apart from occasional evictions; memory is capped by
+max_labels, max_contexts and max_followers regardless of history length.
+"""
+import math
+import time
+from collections import OrderedDict
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class UsageModel:
+    def __init__(self, half_life_days=14.0, max_labels=512, max_contexts=256, max_followers=16):
+        self.half_life = half_life_days * 86400.0
+        self.max_labels = max_labels
+        self.max_contexts = max_contexts
+        self.max_followers = max_followers
+        self.scores = {}                  # label -> (decayed count, last update time)
+        self.followers = OrderedDict()    # previous label -> {label: count}, least recently used first
+        self.last_label = None
+        self.observations = 0
+
+    def _decayed(self, entry, now):
+        score, updated = entry
+        return score * math.pow(0.5, max(0.0, now - updated) / self.half_life)
+
+    def score(self, label, now=None):
+        entry = self.scores.get(label)
+        if entry is None:
+            return 0.0
+        return self._decayed(entry, time.time() if now is None else now)
+
+    def observe(self, label, now=None):
+        """Record one selection; updates both statistics in place."""
+        now = time.time() if now is None else now
+        entry = self.scores.get(label)
+        self.scores[label] = ((self._decayed(entry, now) if entry else 0.0) + 1.0, now)
+        if len(self.scores) > self.max_labels:
+            del self.scores[min(self.scores, key=self._log_weight)]
+
+        if self.last_label is not None:
+            counts = self.followers.pop(self.last_label, None) or {}
+            counts[label] = counts.get(label, 0) + 1
+            if len(counts) > self.max_followers:
+                del counts[min(counts, key=counts.get)]
+            self.followers[self.last_label] = counts
+            if len(self.followers) > self.max_contexts:
+                self.followers.popitem(last=False)
+
+        self.last_label = label
+        self.observations += 1
+
+    def reset_context(self):
+        """Forget the previous selection, e.g. at the start of a session."""
+        self.last_label = None
+
+    def predict(self, candidates):
+        """Most likely next card among `candidates` given the previous selection, or None."""
+        counts = self.followers.get(self.last_label) if self.last_label is not None else None
+        if not counts:
+            return None
+        best, best_count = None, 0
+        for label in candidates:
+            count = counts.get(label, 0)
+            if count > best_count:
+                best, best_count = label, count
+        return best
+
+    def _log_weight(self, label):
+        # log of the decayed score up to a shared constant: orders labels the
+        # same as score(label, now) for any now, without underflowing for old data
+        entry = self.scores.get(label)
+        if entry is None:
+            return -math.inf
+        score, updated = entry
+        return math.log(score) + updated * math.log(2) / self.half_life
+
+    def rank(self, labels, mode="reorder"):
+        """Display order (indices into labels) for one deck level.
+
+        "predict" only moves the predicted card to the front and keeps the
+        authored order otherwise; "reorder" also sorts the rest by decayed
+        frequency. Ties keep the authored order.
+        """
+        predicted = self.predict(labels)
+        if mode == "predict":
+            keys = [0 if label == predicted else 1 for label in labels]
+            return sorted(range(len(labels)), key=keys.__getitem__)
+        keys = [(label != predicted, -self._log_weight(label)) for label in labels]
+        return sorted(range(len(labels)), key=keys.__getitem__)
+
+    # --- Persistence ---
+    def to_dict(self):
+        return {
+            "half_life_days": self.half_life / 86400.0,
+            "scores": {label: list(entry) for label, entry in self.scores.items()},
+            "followers": [[context, counts] for context, counts in self.followers.items()],
+            "observations": self.observations
+        }
+
+    @classmethod
+    def from_dict(cls, data, **kwargs):
+        kwargs.setdefault("half_life_days", data.get("half_life_days", 14.0))
+        model = cls(**kwargs)
+        model.scores = {label: tuple(entry) for label, entry in data.get("scores", {}).items()}
+        model.followers = OrderedDict((context, dict(counts)) for context, counts in data.get("followers", []))
+        model.observations = data.get("observations", 0)
+        return model
+
+    @classmethod
+    def from_history(cls, store, user_id, **kwargs):
+        """Build a model from every card_selected event in a user's saved sessions, oldest first."""
+        model = cls(**kwargs)
+        for session_id, _ in store.list_sessions(user_id):
+            model.reset_context()
+            for label, when in session_selections(store.get_session(user_id, session_id) or {}):
+                model.observe(label, when)
+        model.reset_context()
+        return model
+
+
+def session_selections(payload):
+    """[(label, epoch seconds)] for one saved session's card selections, in order.
+
+    Falls back to the summary's cards_selected (stamped with the session start)
+    for sessions whose events carry no card_selected records.
+    """
+    selections = []
+    for event in payload.get("events", []):
+        if event.get("type") == "card_selected":
+            selections.append((event["label"], _parse_time(event.get("timestamp"))))
+    if selections:
+        return selections
+
+    summary = payload.get("summary", {})
+    started = _parse_time(summary.get("start_time"))
+    return [(label, started) for label in summary.get("cards_selected", [])]
+
+
+def _parse_time(value):
+    try:
+        return time.mktime(time.strptime(value, TIMESTAMP_FORMAT))
+    except (TypeError, ValueError):
+        return 0.0